@@ -58,12 +58,16 @@ def register():
         classes = get_module_classes(m)
         for c in classes:
             register_class(c)
+        if hasattr(m, "register"):
+            m.register()
 
 
 def unregister():
     from bpy.utils import unregister_class
 
     for m in modules:
+        if hasattr(m, "unregister"):
+            m.unregister()
         classes = get_module_classes(m)
         for c in classes:
             unregister_class(c)
@@ -1,16 +1,17 @@
-import bmesh
 import bpy
-from mathutils import Vector
+from mathutils import Vector, Matrix
 
-from ..utils.object import duplicate_object
+from ..utils.edit_mesh import EditMeshSession
+from ..utils.object import duplicate_objects
 from ..utils.selection import (
     select_by_id,
     get_mesh_selection_mode,
     get_selected_bm_vertices,
-    set_mesh_selection_mode,
-    get_linked_verts,
+    MeshSelectionModeState,
+    get_island_vert_ids,
 )
-from ..utils.mesh import duplicate_bmesh_geometry
+from ..utils.instance import OUTPUT_ITEMS, add_geometry_instances, add_object_instances
+from ..utils.mesh import replicate_bmesh_geometry
 
 
 class BastiLinearArray(bpy.types.Operator):
@@ -21,6 +22,7 @@ class BastiLinearArray(bpy.types.Operator):
     * between: distribute copies evenly in the offset
     * islands: when in edit mode duplicate the whole mesh island instead of just the selection
     * linked: when in object mode duplicate the objects linked to the same data
+    * output: create copies or one object instancing the selection with geometry nodes
     """
 
     bl_idname = "basti.linear_array"
@@ -32,6 +34,11 @@ class BastiLinearArray(bpy.types.Operator):
     between: bpy.props.BoolProperty(default=False)
     islands: bpy.props.BoolProperty(default=False)
     linked: bpy.props.BoolProperty(default=False)
+    output: bpy.props.EnumProperty(
+        name="Output",
+        items=OUTPUT_ITEMS,
+        default="COPIES",
+    )
 
     @classmethod
     def poll(cls, context):
@@ -50,51 +57,53 @@ class BastiLinearArray(bpy.types.Operator):
                 else self.offset[axis]
             )
 
-        if selection_mode == "OBJECT":
-            objs_to_duplicate = [active_object]
-            for axis in range(0, 3):
-                if offset[axis] != 0:
-                    new_offset = [0.0, 0.0, 0.0]
-                    new_objs = []
-                    for i in range(1, self.count[axis]):
-                        new_offset[axis] = offset[axis] * i
-
-                        for obj in objs_to_duplicate:
-                            new_obj = duplicate_object(obj, self.linked)
-                            new_obj.location = new_obj.location + Vector(new_offset)
-                            new_objs.append(new_obj)
-
-                    objs_to_duplicate.extend(new_objs)
+        counts = [self.count[axis] if offset[axis] != 0 else 1 for axis in range(0, 3)]
+        matrices = [
+            Matrix.Translation(Vector((offset[0] * x, offset[1] * y, offset[2] * z)))
+            for x in range(counts[0])
+            for y in range(counts[1])
+            for z in range(counts[2])
+        ][1:]
 
+        if selection_mode == "OBJECT":
+            if self.output == "INSTANCES":
+                add_object_instances(
+                    active_object, [m @ active_object.matrix_world for m in matrices]
+                )
+                return {"FINISHED"}
+
+            new_objs = duplicate_objects(active_object, len(matrices), self.linked)
+            for new_obj, matrix in zip(new_objs, matrices):
+                new_obj.location = new_obj.location + matrix.translation
             return {"FINISHED"}
 
-        bm = bmesh.from_edit_mesh(active_object.data)
-        selected_verts = get_selected_bm_vertices(bm, active_object)
-        if self.islands:
-            selected_verts = get_linked_verts(active_object, bm, selected_verts)
+        with MeshSelectionModeState(context), EditMeshSession(active_object) as session:
+            bm = session.bm
+            selected_verts = get_selected_bm_vertices(bm, active_object, session)
+            if self.islands:
+                selected_verts = [
+                    bm.verts[i]
+                    for i in get_island_vert_ids(
+                        active_object,
+                        [v.index for v in selected_verts],
+                        session=session,
+                    ).tolist()
+                ]
+
+            if self.output == "INSTANCES":
+                add_geometry_instances(
+                    active_object, bm, selected_verts, matrices, world_space=False
+                )
+                return {"FINISHED"}
+
+            for new_verts in replicate_bmesh_geometry(bm, selected_verts, matrices):
+                selected_verts.extend(new_verts)
+
+            session.tag_update(destructive=True)
+            session.update_indices()
+            vert_ids = [v.index for v in selected_verts]
+            select_by_id(active_object, "VERT", vert_ids, session=session)
 
-        for axis in range(0, 3):
-            if offset[axis] != 0:
-                new_offset = [0.0, 0.0, 0.0]
-                vert_selection_extension = []
-
-                for i in range(1, self.count[axis]):
-                    new_offset[axis] = offset[axis] * i
-                    new_verts = duplicate_bmesh_geometry(bm, selected_verts)
-                    for vert in new_verts:
-                        vert.co += Vector(new_offset)
-                    vert_selection_extension.extend(new_verts)
-
-                selected_verts.extend(vert_selection_extension)
-
-        vert_ids = [v.index for v in selected_verts]
-        bmesh.update_edit_mesh(active_object.data)
-
-        set_mesh_selection_mode("OBJECT")
-        select_by_id(active_object, "VERT", vert_ids)
-        set_mesh_selection_mode("OBJECT")
-        set_mesh_selection_mode(selection_mode)
-        bm.free()
         return {"FINISHED"}
 
     def draw(self, context):
@@ -105,8 +114,11 @@ class BastiLinearArray(bpy.types.Operator):
         layout.prop(self, "offset")
         layout.prop(self, "between")
 
+        layout.prop(self, "output")
+
         selection_mode = get_mesh_selection_mode(context)
         if selection_mode == "OBJECT":
-            layout.prop(self, "linked")
+            if self.output == "COPIES":
+                layout.prop(self, "linked")
         else:
             layout.prop(self, "islands")
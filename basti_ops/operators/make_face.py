@@ -1,5 +1,6 @@
 import bpy
 
+from ..utils.edit_mesh import EditMeshSession
 from ..utils.selection import (
     get_mesh_selection_mode,
     get_selected_vertices,
@@ -32,31 +33,32 @@ class BastiMakeFace(bpy.types.Operator):
         submesh_mode = get_mesh_selection_mode(context)
         obj = context.active_object
 
-        if submesh_mode == "VERT":
-            selected_verts = get_selected_vertices(obj)
-            linked_edges = get_linked_edges(obj, selected_verts)
-            if not (
-                len(selected_verts) == 3
-                and len(
-                    [
-                        edge
-                        for edge in linked_edges
-                        if all(
-                            vert_index in [v.index for v in selected_verts]
-                            for vert_index in edge.vertices
-                        )
-                    ]
-                )
-            ):
-                select_open_border_loop(obj, linked_edges)
+        with EditMeshSession(obj) as session:
+            if submesh_mode == "VERT":
+                selected_verts = get_selected_vertices(obj, session=session)
+                linked_edges = get_linked_edges(obj, selected_verts, session)
+                if not (
+                    len(selected_verts) == 3
+                    and len(
+                        [
+                            edge
+                            for edge in linked_edges
+                            if all(
+                                vert_index in [v.index for v in selected_verts]
+                                for vert_index in edge.vertices
+                            )
+                        ]
+                    )
+                ):
+                    select_open_border_loop(obj, linked_edges, session)
 
-        elif submesh_mode == "EDGE":
-            selected_edges = get_selected_edges(obj)
-            if not (
-                len(selected_edges) == 2
-                and len({v for e in selected_edges for v in e.vertices}) == 3
-            ):
-                select_open_border_loop(obj, selected_edges)
+            elif submesh_mode == "EDGE":
+                selected_edges = get_selected_edges(obj, session=session)
+                if not (
+                    len(selected_edges) == 2
+                    and len({v for e in selected_edges for v in e.vertices}) == 3
+                ):
+                    select_open_border_loop(obj, selected_edges, session)
 
         bpy.ops.mesh.edge_face_add()
         set_mesh_selection_mode("FACE")
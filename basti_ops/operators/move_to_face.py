@@ -1,20 +1,43 @@
+from contextlib import ExitStack
 from typing import Optional
 from math import radians
 
 import bpy
 import bmesh
-from mathutils import Vector, Quaternion
+import gpu
+import numpy as np
+from gpu_extras.batch import batch_for_shader
+from mathutils import Matrix, Vector, Quaternion
 
+from ..utils.edit_mesh import EditMeshSession
 from ..utils.selection import (
-    get_linked_verts,
+    get_island_vert_ids,
     get_mesh_selection_mode,
-    get_selected_polygons,
-    get_selected_vertices,
-    select_by_id,
-    get_selected,
+    get_selected_ids,
 )
-from ..utils.mesh import get_average_location, get_average_normal, rotate_vertices
-from ..utils.raycast import raycast
+from ..utils.mesh import (
+    get_average_location,
+    get_average_normal,
+    get_mesh_vertex_vectors,
+    update_vertex_normals,
+)
+from ..utils.raycast import RAYCAST_SCENE, get_raycast_scene, get_view_rays, raycast
+from ..utils.topology import get_edge_vertex_array, get_polygon_vertex_array
+from ..utils.ui import set_status_text, clear_status_text
+
+PREVIEW_COLOR = (1.0, 0.6, 0.0, 1.0)
+# events handed on to the view while interactive, so it can still be navigated
+NAVIGATION_EVENTS = {
+    "MIDDLEMOUSE",
+    "WHEELUPMOUSE",
+    "WHEELDOWNMOUSE",
+    "TRACKPADPAN",
+    "TRACKPADZOOM",
+}
+# how often a ray continues through the faces of the moved islands before giving up
+ISLAND_PASS_LIMIT = 32
+# how far past a hit island face the ray continues
+ISLAND_PASS_OFFSET = 1.0e-5
 
 
 class BastiMoveToFace(bpy.types.Operator):
@@ -23,6 +46,11 @@ class BastiMoveToFace(bpy.types.Operator):
     When in edit mode, not just the selection, but all linked elements will be moved.
     * orient: in object mode the object can be rotated to align with the face normal
     * spin: spin around the normal that you oriented to
+    * interactive: follow the mouse over the surfaces until confirmed, mesh islands are previewed and only moved on confirm
+
+
+    * Left Mouse, Enter or Space: confirm when interactive
+    * Right Mouse or Esc: cancel when interactive
     """
 
     bl_idname = "basti.move_to_face"
@@ -31,6 +59,7 @@ class BastiMoveToFace(bpy.types.Operator):
 
     orient: bpy.props.BoolProperty(default=False)
     spin: bpy.props.FloatProperty(name="Spin", default=0.0)
+    interactive: bpy.props.BoolProperty(default=False)
 
     @classmethod
     def poll(cls, context):
@@ -42,67 +71,122 @@ class BastiMoveToFace(bpy.types.Operator):
 
     def invoke(self, context, event):
         self.coords = event.mouse_region_x, event.mouse_region_y
+        if self.interactive and context.region_data is not None:
+            return self.start_interactive(context)
         return self.execute(context)
 
-    def move_submeshes_to_point(
+    def get_islands(
         self,
-        objs: list[bpy.types.Mesh],
-        location: Vector,
-        selection_mode: str,
-        normal: Optional[Vector] = None,
-    ):
-        """Move submeshes to the point and rotate them to the normal"""
-        obj_data = []
-        average_location = Vector((0.0, 0.0, 0.0))
-
+        objs: list[bpy.types.Object],
+        with_normals: bool,
+        stack: ExitStack,
+    ) -> list[dict]:
+        """Returns the island vertex ids, the average location and face normal of the selection per object.
+        The sessions stay open in the stack, so the islands can be moved without reading the meshes again
+        """
+        islands = []
         for obj in objs:
-            selection_ids = get_selected(obj, selection_mode, get_index=True)
-            selected_vert_ids = get_selected_vertices(obj, get_index=True)
-            linked_vert_ids = get_linked_verts(obj, get_index=True)
-            bm = bmesh.from_edit_mesh(obj.data)
-            bm_verts_island = [bm.verts[v_id] for v_id in linked_vert_ids]
-
-            average_location_obj = get_average_location(
-                [bm.verts[v_id] for v_id in selected_vert_ids], obj
-            )
-            if normal and selection_mode == "FACE":
-                average_normal = get_average_normal(get_selected_polygons(obj), obj)
-                rotation_difference = average_normal.rotation_difference(normal * -1)
-                rotate_vertices(
-                    bm_verts_island, rotation_difference, average_location_obj, obj
-                )
+            session = stack.enter_context(EditMeshSession(obj))
+            selected_vert_ids = get_selected_ids(obj, "VERT", session=session)
+            if len(selected_vert_ids) == 0:
+                continue
 
-            average_location += average_location_obj
+            average_normal = None
+            if with_normals:
+                selected_face_ids = get_selected_ids(obj, "FACE", session=session)
+                if len(selected_face_ids) > 0:
+                    average_normal = get_average_normal(selected_face_ids, obj, "FACE")
 
-            obj_data.append(
+            islands.append(
                 {
                     "object": obj,
-                    "island_ids": linked_vert_ids,
-                    "selection_ids": selection_ids,
+                    "session": session,
+                    "island_ids": get_island_vert_ids(
+                        obj, selected_vert_ids, session=session
+                    ),
+                    "location": get_average_location(selected_vert_ids, obj),
+                    "normal": average_normal,
                 }
             )
-            bm.free()
+        return islands
 
-        average_location /= len(objs)
-        move_offset = average_location - location
+    def get_submesh_matrix(
+        self,
+        island: dict,
+        move_offset: Vector,
+        location: Vector,
+        normal: Optional[Vector] = None,
+    ) -> Matrix:
+        """Returns the world space matrix rotating the island to the normal, moving it by the offset
+        and spinning it around the normal at the point"""
+        matrix = Matrix.Translation(-move_offset)
+        if normal and island["normal"] is not None:
+            pivot = island["location"]
+            rotation = island["normal"].rotation_difference(normal * -1).to_matrix()
+            matrix = (
+                matrix
+                @ Matrix.Translation(pivot)
+                @ rotation.to_4x4()
+                @ Matrix.Translation(-pivot)
+            )
+        if normal and self.spin != 0.0:
+            matrix = (
+                Matrix.Translation(location)
+                @ Matrix.Rotation(radians(self.spin), 4, normal)
+                @ Matrix.Translation(-location)
+                @ matrix
+            )
+        return matrix
 
-        for obj_data_entry in obj_data:
-            obj = obj_data_entry["object"]
-            bm = bmesh.from_edit_mesh(obj.data)
-            bm.verts.ensure_lookup_table()
-            verts = [bm.verts[i] for i in obj_data_entry["island_ids"]]
-            for vert in verts:
-                vert_location = obj.matrix_world @ vert.co.copy()
-                vert_location -= move_offset
-                vert.co = obj.matrix_world.inverted() @ vert_location
+    def get_submesh_matrices(
+        self, islands: list[dict], location: Vector, normal: Optional[Vector] = None
+    ) -> list[Matrix]:
+        """Returns the world space matrix of every island, moving their average location to the point"""
+        average_location = sum(
+            (island["location"] for island in islands), Vector()
+        ) / len(islands)
+        move_offset = average_location - location
+        return [
+            self.get_submesh_matrix(island, move_offset, location, normal)
+            for island in islands
+        ]
 
-            if normal and self.spin != 0.0:
-                rotate_vertices(verts, (normal, radians(self.spin)), location, obj)
+    def transform_islands(
+        self, islands: list[dict], location: Vector, normal: Optional[Vector] = None
+    ):
+        """Move every island in its open session with one transform"""
+        for island, matrix in zip(
+            islands, self.get_submesh_matrices(islands, location, normal)
+        ):
+            session = island["session"]
+            matrix_world = island["object"].matrix_world
+            bm = session.bm
+            session.ensure_lookup_tables()
+            verts = [bm.verts[i] for i in island["island_ids"].tolist()]
+            bmesh.ops.transform(
+                bm, matrix=matrix_world.inverted() @ matrix @ matrix_world, verts=verts
+            )
+            # moving keeps the normals, only rotations need them updated
+            if normal:
+                update_vertex_normals(verts)
+            session.tag_update()
 
-            bm.normal_update()
-            bmesh.update_edit_mesh(obj.data)
-            bm.free()
-            select_by_id(obj, selection_mode, obj_data_entry["selection_ids"])
+    def move_submeshes_to_point(
+        self,
+        objs: list[bpy.types.Mesh],
+        location: Vector,
+        selection_mode: str,
+        normal: Optional[Vector] = None,
+    ):
+        """Move submeshes to the point and rotate them to the normal.
+        Every object is read and changed in one session and its island moved by one transform
+        """
+        with ExitStack() as stack:
+            islands = self.get_islands(
+                objs, bool(normal) and selection_mode == "FACE", stack
+            )
+            if islands:
+                self.transform_islands(islands, location, normal)
 
     def move_objects_to_point(
         self,
@@ -129,13 +213,20 @@ class BastiMoveToFace(bpy.types.Operator):
 
                 obj.rotation_euler = difference.to_euler()
 
+    def get_target_objects(self, context) -> list[bpy.types.Object]:
+        """Returns the selected mesh objects, or the active one in edit mode without a selection"""
+        objs_selected = [obj for obj in context.selected_objects if obj.type == "MESH"]
+        if get_mesh_selection_mode(context) != "OBJECT" and len(objs_selected) == 0:
+            objs_selected = [context.active_object]
+        return objs_selected
+
     def move_to_face(self, context, coords):
         raycast_result, location, normal, _, obj_target = raycast(context, coords)
         if not raycast_result:
             return
         selection_mode = get_mesh_selection_mode(context)
         obj_active = context.active_object
-        objs_selected = [obj for obj in context.selected_objects if obj.type == "MESH"]
+        objs_selected = self.get_target_objects(context)
 
         if not self.orient:
             normal = None
@@ -143,10 +234,193 @@ class BastiMoveToFace(bpy.types.Operator):
         if selection_mode == "OBJECT":
             self.move_objects_to_point(objs_selected, Vector(location), normal)
         else:
-            if len(objs_selected) == 0:
-                objs_selected = [obj_active]
             self.move_submeshes_to_point(
                 objs_selected, Vector(location), selection_mode, normal
             )
 
         bpy.context.view_layer.objects.active = obj_active
+
+    def start_interactive(self, context):
+        """Follow the mouse with a frozen raycast scene, so moving objects doesn't rebuild it every frame"""
+        self.selection_mode = get_mesh_selection_mode(context)
+        self.obj_active = context.active_object
+        self.objs = self.get_target_objects(context)
+        if not self.objs:
+            return {"CANCELLED"}
+        self.location = None
+        self.normal = None
+        self.islands = []
+        self.island_face_masks = {}
+        self.preview_batches = []
+        self.preview_matrices = []
+        self.initial_matrices = [obj.matrix_world.copy() for obj in self.objs]
+
+        if self.selection_mode == "OBJECT":
+            # moved objects would be hit by the rays cast through them
+            self.ignored_objects = self.objs
+        else:
+            self.ignored_objects = []
+            with ExitStack() as stack:
+                self.islands = self.get_islands(
+                    self.objs, self.orient and self.selection_mode == "FACE", stack
+                )
+            if not self.islands:
+                return {"CANCELLED"}
+            self.preview_batches = [
+                self.get_preview_batch(island) for island in self.islands
+            ]
+            # the islands stay in place until confirmed, the rays pass through their faces
+            self.island_face_masks = {
+                island["object"].name_full: self.get_island_face_mask(island)
+                for island in self.islands
+            }
+
+        get_raycast_scene(context).freeze()
+        self.draw_handler = bpy.types.SpaceView3D.draw_handler_add(
+            self.draw_preview, (), "WINDOW", "POST_VIEW"
+        )
+        context.window_manager.modal_handler_add(self)
+        set_status_text(
+            [
+                ("MOUSE_LMB", "Confirm"),
+                ("KEY_RETURN", "Confirm"),
+                ("EVENT_SPACEKEY", "Confirm"),
+                ("MOUSE_RMB", "Cancel"),
+                ("EVENT_ESC", "Cancel"),
+            ]
+        )
+        self.handle_mouse_move(context, self.coords)
+        return {"RUNNING_MODAL"}
+
+    def modal(self, context, event):
+        if event.type in {"ESC", "RIGHTMOUSE"} and event.value == "PRESS":
+            self.handle_cancel(context)
+            return {"CANCELLED"}
+
+        if event.type in {"LEFTMOUSE", "RET", "SPACE"} and event.value == "PRESS":
+            return self.handle_confirm(context)
+
+        if event.type == "MOUSEMOVE":
+            self.handle_mouse_move(
+                context, (event.mouse_region_x, event.mouse_region_y)
+            )
+            return {"RUNNING_MODAL"}
+
+        if event.type in NAVIGATION_EVENTS or event.type.startswith("NDOF"):
+            return {"PASS_THROUGH"}
+
+        return {"RUNNING_MODAL"}
+
+    def handle_mouse_move(self, context, coords):
+        """Move the objects or the island previews, only a transform changes per frame"""
+        if self.islands:
+            raycast_result, location, normal, _, _ = self.raycast_past_islands(
+                context, coords
+            )
+        else:
+            raycast_result, location, normal, _, _ = raycast(
+                context, coords, ignore=self.ignored_objects
+            )
+        if not raycast_result:
+            return
+        self.coords = coords
+        self.location = location
+        self.normal = normal if self.orient else None
+
+        if self.selection_mode == "OBJECT":
+            self.move_objects_to_point(self.objs, self.location, self.normal)
+        else:
+            self.preview_matrices = self.get_submesh_matrices(
+                self.islands, self.location, self.normal
+            )
+            context.area.tag_redraw()
+
+    def raycast_past_islands(
+        self, context, coords
+    ) -> tuple[bool, Vector, Vector, int, Optional[bpy.types.Object]]:
+        """Casts a ray at the mouse position, continuing through the faces of the islands"""
+        origins, directions = get_view_rays(context, [coords])
+        origin = Vector(origins[0])
+        direction = Vector(directions[0]).normalized()
+        scene = get_raycast_scene(context)
+        for _ in range(ISLAND_PASS_LIMIT):
+            result = scene.ray_cast(origin, direction, ignore=self.ignored_objects)
+            hit, location, _, face_index, obj = result
+            face_mask = self.island_face_masks.get(obj.name_full) if hit else None
+            if (
+                face_mask is None
+                or face_index >= len(face_mask)
+                or not face_mask[face_index]
+            ):
+                return result
+            origin = location + direction * ISLAND_PASS_OFFSET
+        return False, Vector(), Vector(), -1, None
+
+    def handle_confirm(self, context):
+        moved = self.location is not None
+        if moved and self.selection_mode != "OBJECT":
+            with ExitStack() as stack:
+                for island in self.islands:
+                    island["session"] = stack.enter_context(
+                        EditMeshSession(island["object"])
+                    )
+                self.transform_islands(self.islands, self.location, self.normal)
+        self.clean_up(context)
+        bpy.context.view_layer.objects.active = self.obj_active
+        return {"FINISHED"} if moved else {"CANCELLED"}
+
+    def handle_cancel(self, context):
+        if self.selection_mode == "OBJECT":
+            for obj, matrix in zip(self.objs, self.initial_matrices):
+                obj.matrix_world = matrix
+        self.clean_up(context)
+
+    def clean_up(self, context):
+        bpy.types.SpaceView3D.draw_handler_remove(self.draw_handler, "WINDOW")
+        RAYCAST_SCENE.thaw(self.objs)
+        self.islands = []
+        self.island_face_masks = {}
+        self.preview_batches = []
+        clear_status_text()
+        context.area.tag_redraw()
+
+    def get_island_face_mask(self, island: dict) -> np.ndarray:
+        """Returns a mask of the faces of the island in the mesh of its object"""
+        mesh = island["object"].data
+        offsets, vert_ids = get_polygon_vertex_array(mesh)
+        if len(mesh.polygons) == 0:
+            return np.zeros(0, dtype=bool)
+        in_island = np.zeros(len(mesh.vertices), dtype=bool)
+        in_island[island["island_ids"]] = True
+        return np.logical_or.reduceat(in_island[vert_ids], offsets[:-1])
+
+    def get_preview_batch(self, island: dict) -> gpu.types.GPUBatch:
+        """Returns a batch drawing the edges of the island in the local space of its object"""
+        mesh = island["object"].data
+        island_ids = island["island_ids"]
+        edge_verts = get_edge_vertex_array(mesh)
+        in_island = np.zeros(len(mesh.vertices), dtype=bool)
+        in_island[island_ids] = True
+        island_edges = edge_verts[in_island[edge_verts].all(axis=1)]
+
+        local_ids = np.zeros(len(mesh.vertices), dtype=np.int32)
+        local_ids[island_ids] = np.arange(len(island_ids), dtype=np.int32)
+        shader = gpu.shader.from_builtin("UNIFORM_COLOR")
+        return batch_for_shader(
+            shader,
+            "LINES",
+            {"pos": get_mesh_vertex_vectors(mesh, vert_ids=island_ids)},
+            indices=local_ids[island_edges],
+        )
+
+    def draw_preview(self):
+        if self.location is None or not self.preview_batches:
+            return
+        shader = gpu.shader.from_builtin("UNIFORM_COLOR")
+        shader.uniform_float("color", PREVIEW_COLOR)
+        for island, batch, matrix in zip(
+            self.islands, self.preview_batches, self.preview_matrices
+        ):
+            with gpu.matrix.push_pop():
+                gpu.matrix.multiply_matrix(matrix @ island["object"].matrix_world)
+                batch.draw(shader)
@@ -1,13 +1,23 @@
 import bpy
 import bmesh
+import numpy as np
 
-from ..utils.mesh import duplicate_bmesh_geometry
+from ..utils.edit_mesh import EditMeshSession
+from ..utils.mesh import (
+    duplicate_bmesh_geometry_with_map,
+    get_mesh_vertex_vectors,
+)
+from ..utils.symmetry import (
+    MIRROR_AXIS_ITEMS,
+    MIRROR_ORIENTATION_ITEMS,
+    MIRROR_PIVOT_ITEMS,
+    get_mirror_plane,
+    get_symmetry_map,
+)
+from ..utils.transform import get_plane_functional, get_reflection_matrix
 from ..utils.selection import (
-    select_by_id,
-    get_mesh_selection_mode,
-    set_mesh_selection_mode,
     get_selected_bm_vertices,
-    get_linked_verts,
+    get_island_vert_ids,
 )
 
 
@@ -16,6 +26,7 @@ class BastiQuickMirror(bpy.types.Operator):
     Mirror geometry across an axis, with the option to clear geometry on the target side first.
     The source side is determined by where the selection is in relation to the pivot.
     * Axis: the axis to mirror on
+    * Orientation: the orientation of the axis, or the plane of the active face
     * Pivot: the pivot to mirror across
     * Scope: mirror only selected, everything linked to the selected or everything on the same side of the pivot
     * Delete Target Side: whether to not delete anything, only elements linked to the selection or everything on the other side of the pivot
@@ -29,20 +40,17 @@ class BastiQuickMirror(bpy.types.Operator):
 
     axis: bpy.props.EnumProperty(
         name="Axis",
-        items=[
-            ("X", "X", "X"),
-            ("Y", "Y", "Y"),
-            ("Z", "Z", "Z"),
-        ],
+        items=MIRROR_AXIS_ITEMS,
         default="X",
     )
+    orientation: bpy.props.EnumProperty(
+        name="Orientation",
+        items=MIRROR_ORIENTATION_ITEMS,
+        default="GLOBAL",
+    )
     pivot: bpy.props.EnumProperty(
         name="Pivot",
-        items=[
-            ("ORIGIN", "Origin", "World Origin"),
-            ("PIVOT", "Pivot", "Object Pivot"),
-            ("CURSOR", "Cursor", "3d Cursor"),
-        ],
+        items=MIRROR_PIVOT_ITEMS,
         default="ORIGIN",
     )
     scope: bpy.props.EnumProperty(
@@ -81,73 +89,126 @@ class BastiQuickMirror(bpy.types.Operator):
         )
 
     def execute(self, context):
-        axis_int = 0
-        if self.axis != "X":
-            axis_int += 1 if self.axis == "Y" else 2
-
-        def get_offset_coords(vert: bmesh.types.BMVert):
-            coords = vert.co.copy()
-            if self.pivot == "PIVOT":
-                return coords
-            coords = obj.matrix_world @ coords
-            if self.pivot == "CURSOR":
-                coords[axis_int] -= context.scene.cursor.location[axis_int]
-            return coords
-
-        selection_mode = get_mesh_selection_mode(context)
         obj = context.active_object
-        bm = bmesh.from_edit_mesh(obj.data)
-
-        bm_verts_selected = get_selected_bm_vertices(bm, obj)
-        average_location = sum(
-            [get_offset_coords(v)[axis_int] for v in bm_verts_selected]
-        ) / len(bm_verts_selected)
-        if self.delete_target != "NO":
-            deletion_side = -1 if average_location > 0 else 1
-            verts_to_check = (
-                get_linked_verts(obj, bm, bm_verts_selected)
-                if self.delete_target == "ISLAND"
-                else bm.verts
-            )
-            verts_to_delete = [
-                v
-                for v in verts_to_check
-                if get_offset_coords(v)[axis_int] * deletion_side
-                > self.auto_merge_distance
-            ]
-            for vert in verts_to_delete:
-                if vert in bm_verts_selected:
-                    bm_verts_selected.remove(vert)
-            bmesh.ops.delete(bm, geom=verts_to_delete)
-
-        bm_verts_to_duplicate = (
-            get_linked_verts(obj, bm, bm_verts_selected)
-            if self.scope == "ISLAND"
-            else bm_verts_selected if self.scope == "SELECTED" else list(bm.verts)
-        )
-        bm_verts_duplicated = duplicate_bmesh_geometry(bm, bm_verts_to_duplicate, True)
-
-        for vert in bm_verts_duplicated:
-            coords = get_offset_coords(vert)
-
-            coords[axis_int] *= -1.0
 
-            if self.pivot in ["ORIGIN", "CURSOR"]:
-                if self.pivot == "CURSOR":
-                    coords[axis_int] += context.scene.cursor.location[axis_int]
-                coords = obj.matrix_world.inverted() @ coords
-            vert.co = coords
+        def get_plane_distances() -> np.ndarray:
+            session.sync()
+            return get_mesh_vertex_vectors(obj.data) @ plane_factors + plane_offset
 
-        bm.normal_update()
-        bmesh.update_edit_mesh(obj.data)
-        bm.free()
+        with EditMeshSession(obj) as session:
+            bm = session.bm
+            plane = get_mirror_plane(
+                context, obj, bm, self.axis, self.orientation, self.pivot
+            )
+            if plane is None:
+                self.report({"WARNING"}, "No plane to mirror across")
+                return {"CANCELLED"}
+            plane_point, plane_normal, world_space = plane
+            plane_matrix = obj.matrix_world if world_space else None
+            plane_factors, plane_offset = get_plane_functional(
+                plane_point, plane_normal, plane_matrix
+            )
+            reflection = get_reflection_matrix(plane_point, plane_normal, plane_matrix)
 
-        if self.auto_merge:
-            select_by_id(obj, "VERT", [v.index for v in bm_verts_duplicated])
-            bpy.ops.mesh.remove_doubles(
-                threshold=self.auto_merge_distance, use_unselected=True
+            bm_verts_selected = get_selected_bm_vertices(bm, obj, session)
+            distances = get_plane_distances()
+            selected_ids = np.array(
+                [v.index for v in bm_verts_selected], dtype=np.int64
+            )
+            if len(selected_ids) == 0:
+                self.report({"WARNING"}, "Nothing selected to mirror")
+                return {"CANCELLED"}
+
+            deleted_any = False
+            if self.delete_target != "NO":
+                deletion_side = -1 if distances[selected_ids].mean() > 0 else 1
+                check_ids = (
+                    get_island_vert_ids(obj, selected_ids, session=session)
+                    if self.delete_target == "ISLAND"
+                    else np.arange(len(distances))
+                )
+                delete_ids = check_ids[
+                    distances[check_ids] * deletion_side > self.auto_merge_distance
+                ]
+                if len(delete_ids) > 0:
+                    session.ensure_lookup_tables()
+                    verts_to_delete = [bm.verts[i] for i in delete_ids.tolist()]
+                    deleted = set(verts_to_delete)
+                    bm_verts_selected = [
+                        v for v in bm_verts_selected if v not in deleted
+                    ]
+                    bmesh.ops.delete(bm, geom=verts_to_delete)
+                    deleted_any = True
+                    # deleting can split islands and shifts the vertex indices
+                    session.tag_update(destructive=True)
+                    distances = get_plane_distances()
+                    selected_ids = np.array(
+                        [v.index for v in bm_verts_selected], dtype=np.int64
+                    )
+
+            if self.scope == "ISLAND":
+                duplicate_ids = get_island_vert_ids(obj, selected_ids, session=session)
+            elif self.scope == "SELECTED":
+                duplicate_ids = selected_ids
+            else:
+                duplicate_ids = np.arange(len(distances))
+            session.ensure_lookup_tables()
+            bm_verts_to_duplicate = [bm.verts[i] for i in duplicate_ids.tolist()]
+
+            partner_ids = None
+            if self.auto_merge and not deleted_any:
+                # an unchanged mesh may have its partners cached already, e.g. by select mirror
+                partner_ids = get_symmetry_map(
+                    obj,
+                    plane_point,
+                    plane_normal,
+                    world_space,
+                    self.auto_merge_distance,
+                    session,
+                    vert_ids=duplicate_ids,
+                    cached_only=True,
+                )
+            weld_pairs = []
+            if partner_ids is not None:
+                # a copy lands on the mirror partner of its source, on the seam that is the source itself
+                weld_pairs = [
+                    (source, bm.verts[partner_id])
+                    for source, partner_id in zip(
+                        bm_verts_to_duplicate, partner_ids[duplicate_ids].tolist()
+                    )
+                    if partner_id >= 0
+                ]
+            seam_sources = []
+            if self.auto_merge and partner_ids is None:
+                # without a map only the seam can overlap, so only copies near the plane are welded
+                seam_sources = [
+                    bm_verts_to_duplicate[i]
+                    for i in np.flatnonzero(
+                        np.abs(distances[duplicate_ids]) <= self.auto_merge_distance
+                    ).tolist()
+                ]
+
+            bm_verts_duplicated, vert_map = duplicate_bmesh_geometry_with_map(
+                bm, bm_verts_to_duplicate, True
             )
+            bmesh.ops.transform(bm, matrix=reflection, verts=bm_verts_duplicated)
+
+            if weld_pairs:
+                bmesh.ops.weld_verts(
+                    bm,
+                    targetmap={
+                        vert_map[source]: partner for source, partner in weld_pairs
+                    },
+                )
+            if seam_sources:
+                weld_verts_by_distance(
+                    bm,
+                    [vert_map[v] for v in seam_sources],
+                    seam_sources,
+                    self.auto_merge_distance,
+                )
+
+            bm.normal_update()
+            session.tag_update(destructive=True)
 
-        set_mesh_selection_mode("OBJECT")
-        set_mesh_selection_mode(selection_mode)
         return {"FINISHED"}
@@ -1,17 +1,18 @@
 import math
 
-import bmesh
 import bpy
-from mathutils import Vector, Quaternion
+from mathutils import Vector, Matrix
 
-from ..utils.object import duplicate_object
+from ..utils.edit_mesh import EditMeshSession
+from ..utils.object import duplicate_objects
 from ..utils.selection import (
     get_mesh_selection_mode,
     get_selected_bm_vertices,
-    set_mesh_selection_mode,
-    get_linked_verts,
+    MeshSelectionModeState,
+    get_island_vert_ids,
 )
-from ..utils.mesh import duplicate_bmesh_geometry
+from ..utils.instance import OUTPUT_ITEMS, add_geometry_instances, add_object_instances
+from ..utils.mesh import replicate_bmesh_geometry
 
 
 class BastiRadialArray(bpy.types.Operator):
@@ -22,6 +23,7 @@ class BastiRadialArray(bpy.types.Operator):
     * count: how many copies to add
     * islands: when in edit mode duplicate the whole mesh island instead of just the selection
     * linked: when in object mode duplicate duplicate the objects linked to the same data
+    * output: create copies or one object instancing the selection with geometry nodes
     """
 
     bl_idname = "basti.radial_array"
@@ -49,6 +51,11 @@ class BastiRadialArray(bpy.types.Operator):
     count: bpy.props.IntProperty(default=4)
     islands: bpy.props.BoolProperty(default=False)
     linked: bpy.props.BoolProperty(default=False)
+    output: bpy.props.EnumProperty(
+        name="Output",
+        items=OUTPUT_ITEMS,
+        default="COPIES",
+    )
 
     @classmethod
     def poll(cls, context):
@@ -73,43 +80,45 @@ class BastiRadialArray(bpy.types.Operator):
             )
         )
 
+        pivot_matrix = Matrix.Translation(rotation_pivot)
+        matrices = [
+            pivot_matrix
+            @ Matrix.Rotation(rotation_rad * i, 4, rotation_axis)
+            @ pivot_matrix.inverted()
+            for i in range(1, self.count)
+        ]
+
         if selection_mode == "OBJECT":
-            rotation_pivot_offest = rotation_pivot - active_object.location
-            for i in range(1, self.count):
-                new_obj = duplicate_object(active_object, self.linked)
-                with bpy.context.temp_override(
-                    active_object=new_obj, selected_objects=[new_obj]
-                ):
-                    bpy.ops.transform.translate(value=rotation_pivot_offest)
-                    bpy.ops.transform.rotate(
-                        value=rotation_rad * i, orient_axis=self.axis
-                    )
-                    new_position_offset = -rotation_pivot_offest
-                    new_position_offset.rotate(
-                        Quaternion(rotation_axis, rotation_rad * i)
-                    )
-                    bpy.ops.transform.translate(value=new_position_offset)
+            world_matrices = [m @ active_object.matrix_world for m in matrices]
+            if self.output == "INSTANCES":
+                add_object_instances(active_object, world_matrices)
+                return {"FINISHED"}
+
+            new_objs = duplicate_objects(active_object, len(matrices), self.linked)
+            for new_obj, matrix in zip(new_objs, world_matrices):
+                new_obj.matrix_world = matrix
             return {"FINISHED"}
 
-        bm = bmesh.from_edit_mesh(active_object.data)
-        selected_verts = get_selected_bm_vertices(bm, active_object)
-        if self.islands:
-            selected_verts = get_linked_verts(active_object, bm, selected_verts)
-
-        for i in range(1, self.count):
-            new_verts = duplicate_bmesh_geometry(bm, selected_verts)
-            for vert in new_verts:
-                coords = active_object.matrix_world @ vert.co.copy()
-                coords -= rotation_pivot
-                coords.rotate(Quaternion(rotation_axis, rotation_rad * i))
-                coords += rotation_pivot
-                vert.co = active_object.matrix_world.inverted() @ coords
-
-        bmesh.update_edit_mesh(active_object.data)
-        bm.free()
-
-        set_mesh_selection_mode("OBJECT")
-        set_mesh_selection_mode(selection_mode)
+        with MeshSelectionModeState(context), EditMeshSession(active_object) as session:
+            bm = session.bm
+            selected_verts = get_selected_bm_vertices(bm, active_object, session)
+            if self.islands:
+                selected_verts = [
+                    bm.verts[i]
+                    for i in get_island_vert_ids(
+                        active_object,
+                        [v.index for v in selected_verts],
+                        session=session,
+                    ).tolist()
+                ]
+
+            if self.output == "INSTANCES":
+                add_geometry_instances(active_object, bm, selected_verts, matrices)
+                return {"FINISHED"}
+
+            replicate_bmesh_geometry(bm, selected_verts, matrices, active_object)
+            session.tag_update(destructive=True)
+
         return {"FINISHED"}
 
     def draw(self, context):
@@ -120,8 +129,11 @@ class BastiRadialArray(bpy.types.Operator):
         layout.prop(self, "pivot")
         layout.prop(self, "axis")
 
+        layout.prop(self, "output")
+
         selection_mode = get_mesh_selection_mode(context)
         if selection_mode == "OBJECT":
-            layout.prop(self, "linked")
+            if self.output == "COPIES":
+                layout.prop(self, "linked")
         else:
             layout.prop(self, "islands")
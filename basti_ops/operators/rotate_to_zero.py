@@ -1,13 +1,13 @@
 from math import radians
 
 import bpy
-import bmesh
 from mathutils import Vector
 
+from ..utils.edit_mesh import EditMeshSession
 from ..utils.selection import (
     get_linked_verts,
     get_mesh_selection_mode,
-    set_mesh_selection_mode,
+    MeshSelectionModeState,
     get_selected_polygons,
     get_selected_vertices,
 )
@@ -68,31 +68,26 @@ class BastiRotateToZero(bpy.types.Operator):
 
         rotation_difference = average_normal.rotation_difference(target_direction)
 
-        selected_vertices = get_selected_vertices(obj)
-        average_location = get_average_location(selected_vertices, obj)
-        linked_vertices = get_linked_verts(
-            obj, seed_verts=selected_vertices, get_index=True
-        )
-
-        bm = bmesh.from_edit_mesh(obj.data)
-        bm.verts.ensure_lookup_table()
+        with MeshSelectionModeState(context), EditMeshSession(obj) as session:
+            selected_vertices = get_selected_vertices(obj, session=session)
+            average_location = get_average_location(selected_vertices, obj)
+            linked_vertices = get_linked_verts(
+                obj, seed_verts=selected_vertices, get_index=True, session=session
+            )
 
-        verts = [bm.verts[i] for i in linked_vertices]
+            session.ensure_lookup_tables()
+            verts = [session.bm.verts[i] for i in linked_vertices]
 
-        rotate_vertices(
-            verts,
-            rotation_difference,
-            average_location,
-            obj,
-        )
-        if self.spin != 0.0:
             rotate_vertices(
-                verts, (target_direction, radians(self.spin)), average_location, obj
+                verts,
+                rotation_difference,
+                average_location,
+                obj,
             )
+            if self.spin != 0.0:
+                rotate_vertices(
+                    verts, (target_direction, radians(self.spin)), average_location, obj
+                )
+            session.tag_update()
 
-        bmesh.update_edit_mesh(obj.data)
-        bm.free()
-
-        set_mesh_selection_mode("OBJECT")
-        set_mesh_selection_mode("FACE")
         return {"FINISHED"}
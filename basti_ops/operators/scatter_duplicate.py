@@ -1,32 +1,52 @@
-from math import radians
-from random import uniform, seed
-
-import bmesh
 import bpy
-from mathutils import Vector, Euler
+import numpy as np
+from mathutils import Euler, Matrix, Vector
 
-from ..utils.object import duplicate_object
+from ..utils.edit_mesh import EditMeshSession
+from ..utils.object import duplicate_objects
 from ..utils.selection import (
     select_by_id,
     get_mesh_selection_mode,
     get_selected_bm_vertices,
-    set_mesh_selection_mode,
-    get_linked_verts,
+    MeshSelectionModeState,
+    get_island_vert_ids,
+)
+from ..utils.instance import OUTPUT_ITEMS, add_geometry_instances, add_object_instances
+from ..utils.mesh import replicate_bmesh_geometry, get_average_location
+from ..utils.sampling import (
+    get_poisson_disk_mask,
+    get_surface_samples,
+    get_view_samples,
+)
+from ..utils.transform import (
+    compose_matrices,
+    get_alignment_matrices,
+    get_euler_matrices,
+    get_pivot_matrices,
+    get_random_transforms,
+    to_matrices,
+    to_vectors,
 )
-from ..utils.mesh import duplicate_bmesh_geometry, get_average_location
+
+# candidate points sampled per copy on surfaces, the minimum distance drops most of them
+SURFACE_SAMPLES_PER_COPY = 4
 
 
 class BastiScatterDuplicate(bpy.types.Operator):
     """.scatter_duplicate
     Create copies of the selection with randomized offsets and rotations
     * count: how many copies to add
+    * placement: offset the copies randomly, place them on the surfaces under the view or on the other selected objects
     * offset: the maximum offset
     * add_negative_offset: instead of random values between 0 and maximum, extend the range to -maximum to maximum
     * rotation: the maximum rotation in degrees
     * add_negative_rotation: instead of random values between 0 and maximum, extend the range to -maximum to maximum
     * seed: the seed for randomization
+    * min_distance: the minimum distance between copies placed on surfaces
+    * align_to_normal: turn the Z axis of copies placed on surfaces along the surface normal
     * islands: when in edit mode duplicate the whole mesh island instead of just the selection
     * linked: when in object mode duplicate the objects linked to the same data
+    * output: create copies or one object instancing the selection with geometry nodes
     """
 
     bl_idname = "basti.scatter_duplicate"
@@ -34,16 +54,29 @@ class BastiScatterDuplicate(bpy.types.Operator):
     bl_options = {"REGISTER", "UNDO"}
 
     count: bpy.props.IntProperty(default=1)
+    placement: bpy.props.EnumProperty(
+        name="Placement",
+        items=[
+            ("RANDOM", "Random", "Offset the copies randomly"),
+            ("VIEW", "View", "Place the copies on the surfaces under the view"),
+            ("TARGET", "Target", "Place the copies on the other selected objects"),
+        ],
+        default="RANDOM",
+    )
     offset: bpy.props.FloatVectorProperty()
     add_negative_offset: bpy.props.BoolProperty(default=False)
     rotation: bpy.props.FloatVectorProperty()
     add_negative_rotation: bpy.props.BoolProperty(default=False)
     seed: bpy.props.IntProperty(default=1)
+    min_distance: bpy.props.FloatProperty(default=0.0, min=0.0, subtype="DISTANCE")
+    align_to_normal: bpy.props.BoolProperty(default=True)
     islands: bpy.props.BoolProperty(default=True)
     linked: bpy.props.BoolProperty(default=False)
-
-    min_offset = (0.0, 0.0, 0.0)
-    min_rotation = (0.0, 0.0, 0.0)
+    output: bpy.props.EnumProperty(
+        name="Output",
+        items=OUTPUT_ITEMS,
+        default="COPIES",
+    )
 
     @classmethod
     def poll(cls, context):
@@ -51,38 +84,130 @@ class BastiScatterDuplicate(bpy.types.Operator):
             context.active_object is not None and context.active_object.type == "MESH"
         )
 
-    def get_new_offset_and_rotation(self):
-        return Vector(
-            [
-                uniform(self.min_offset[0], self.offset[0]),
-                uniform(self.min_offset[1], self.offset[1]),
-                uniform(self.min_offset[2], self.offset[2]),
-            ]
-        ), Euler(
-            [
-                radians(uniform(self.min_rotation[0], self.rotation[0])),
-                radians(uniform(self.min_rotation[1], self.rotation[1])),
-                radians(uniform(self.min_rotation[2], self.rotation[2])),
-            ]
-        )
-
-    def execute(self, context):
-        seed(self.seed)
-        selection_mode = get_mesh_selection_mode(context)
-        active_object = context.active_object
+    def get_offsets_and_rotations(self, count: int) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the offsets and the euler rotations in radians of all copies"""
+        min_offset = (0.0, 0.0, 0.0)
+        min_rotation = (0.0, 0.0, 0.0)
         if self.add_negative_offset:
-            self.min_offset = (-self.offset[0], -self.offset[1], -self.offset[2])
+            min_offset = (-self.offset[0], -self.offset[1], -self.offset[2])
         if self.add_negative_rotation:
-            self.min_rotation = (
+            min_rotation = (
                 -self.rotation[0],
                 -self.rotation[1],
                 -self.rotation[2],
             )
+        offsets, rotations = get_random_transforms(
+            count,
+            self.seed,
+            (min_offset, tuple(self.offset)),
+            (min_rotation, tuple(self.rotation)),
+        )
+        return offsets, np.radians(rotations)
+
+    def get_matrices(self, count: int, pivot: Vector) -> list[Matrix]:
+        """Returns the world space matrices of all copies rotating around the pivot"""
+        offsets, rotations = self.get_offsets_and_rotations(count)
+        return to_matrices(
+            get_pivot_matrices(
+                compose_matrices(get_euler_matrices(rotations), offsets), pivot
+            )
+        )
+
+    def get_surface_matrices(
+        self,
+        context: bpy.types.Context,
+        count: int,
+        pivot: Vector,
+        sources: list[bpy.types.Object],
+    ) -> list[Matrix]:
+        """Returns the world space matrices moving the pivot onto points of the surfaces at least the minimum
+        distance apart, rotated randomly and along the surface normals. There can be less than count of them
+        """
+        sample_count = count
+        if self.min_distance > 0.0:
+            sample_count *= SURFACE_SAMPLES_PER_COPY
+
+        if self.placement == "TARGET":
+            targets = [
+                o
+                for o in context.selected_objects
+                if o.type == "MESH" and o not in sources
+            ]
+            points, normals = get_surface_samples(
+                targets, context.evaluated_depsgraph_get(), sample_count, self.seed
+            )
+        else:
+            points, normals = get_view_samples(
+                context, sample_count, self.seed, sources
+            )
+
+        mask = get_poisson_disk_mask(points, self.min_distance, count)
+        points, normals = points[mask], normals[mask]
+        _, rotations = self.get_offsets_and_rotations(len(points))
+        rotations = get_euler_matrices(rotations)
+        if self.align_to_normal:
+            rotations = get_alignment_matrices(normals) @ rotations
+        translations = points - rotations @ np.asarray(pivot)
+        return to_matrices(compose_matrices(rotations, translations))
+
+    def get_copy_matrices(
+        self,
+        context: bpy.types.Context,
+        count: int,
+        pivot: Vector,
+        sources: list[bpy.types.Object],
+    ) -> list[Matrix]:
+        """Returns the world space matrices of all copies for the placement"""
+        if self.placement == "RANDOM":
+            return self.get_matrices(count, pivot)
+
+        matrices = self.get_surface_matrices(context, count, pivot, sources)
+        if len(matrices) < count:
+            self.report(
+                {"WARNING"},
+                f"Only {len(matrices)} of {count} copies found room on the surfaces",
+            )
+        return matrices
+
+    def execute(self, context):
+        selection_mode = get_mesh_selection_mode(context)
+        active_object = context.active_object
+
+        if self.placement == "VIEW" and context.region_data is None:
+            self.report({"ERROR"}, "Placing on the view needs a 3D viewport")
+            return {"CANCELLED"}
+        if self.placement == "TARGET" and not any(
+            o.type == "MESH" and o != active_object for o in context.selected_objects
+        ):
+            self.report({"ERROR"}, "Select the target objects next to the active one")
+            return {"CANCELLED"}
 
         if selection_mode == "OBJECT":
-            for i in range(1, self.count):
-                new_obj = duplicate_object(active_object, self.linked)
-                new_offset, new_rotation = self.get_new_offset_and_rotation()
+            matrix_world = active_object.matrix_world
+            if self.output == "INSTANCES":
+                matrices = self.get_copy_matrices(
+                    context, self.count - 1, matrix_world.translation, [active_object]
+                )
+                add_object_instances(
+                    active_object, [m @ matrix_world for m in matrices]
+                )
+                return {"FINISHED"}
+
+            if self.placement != "RANDOM":
+                matrices = self.get_copy_matrices(
+                    context, self.count - 1, matrix_world.translation, [active_object]
+                )
+                new_objs = duplicate_objects(active_object, len(matrices), self.linked)
+                for new_obj, matrix in zip(new_objs, matrices):
+                    new_obj.matrix_world = matrix @ matrix_world
+                return {"FINISHED"}
+
+            new_objs = duplicate_objects(active_object, self.count - 1, self.linked)
+            offsets, rotations = self.get_offsets_and_rotations(len(new_objs))
+            for new_obj, new_offset, new_rotation in zip(
+                new_objs, to_vectors(offsets), rotations.tolist()
+            ):
+                new_rotation = Euler(new_rotation)
                 if new_obj.rotation_mode == "QUATERNION":
                     new_obj.rotation_quaternion.rotate(new_rotation)
                 else:
@@ -91,34 +216,40 @@ class BastiScatterDuplicate(bpy.types.Operator):
 
             return {"FINISHED"}
 
-        bm = bmesh.from_edit_mesh(active_object.data)
-        selected_verts = get_selected_bm_vertices(bm, active_object)
-        if self.islands:
-            selected_verts = get_linked_verts(active_object, bm, selected_verts)
-
-        average_location = get_average_location(selected_verts, active_object)
-        vert_selection_extension = []
-        for i in range(1, self.count):
-            new_offset, new_rotation = self.get_new_offset_and_rotation()
-            new_verts = duplicate_bmesh_geometry(bm, selected_verts)
-            for vert in new_verts:
-                location = active_object.matrix_world @ vert.co.copy()
-                location -= average_location
-                location.rotate(new_rotation)
-                location += average_location + new_offset
-                vert.co = active_object.matrix_world.inverted() @ location
-            vert_selection_extension.extend(new_verts)
-
-        selected_verts.extend(vert_selection_extension)
-
-        vert_ids = [v.index for v in selected_verts]
-        bmesh.update_edit_mesh(active_object.data)
-
-        set_mesh_selection_mode("OBJECT")
-        select_by_id(active_object, "VERT", vert_ids)
-        set_mesh_selection_mode("OBJECT")
-        set_mesh_selection_mode(selection_mode)
-        bm.free()
+        with MeshSelectionModeState(context), EditMeshSession(active_object) as session:
+            bm = session.bm
+            selected_verts = get_selected_bm_vertices(bm, active_object, session)
+            if self.islands:
+                selected_verts = [
+                    bm.verts[i]
+                    for i in get_island_vert_ids(
+                        active_object,
+                        [v.index for v in selected_verts],
+                        session=session,
+                    ).tolist()
+                ]
+
+            if not selected_verts:
+                self.report({"WARNING"}, "Nothing selected to scatter")
+                return {"CANCELLED"}
+            average_location = get_average_location(selected_verts, active_object)
+            matrices = self.get_copy_matrices(
+                context, self.count - 1, average_location, [active_object]
+            )
+            if self.output == "INSTANCES":
+                add_geometry_instances(active_object, bm, selected_verts, matrices)
+                return {"FINISHED"}
+
+            for new_verts in replicate_bmesh_geometry(
+                bm, selected_verts, matrices, active_object
+            ):
+                selected_verts.extend(new_verts)
+
+            session.tag_update(destructive=True)
+            session.update_indices()
+            vert_ids = [v.index for v in selected_verts]
+            select_by_id(active_object, "VERT", vert_ids, session=session)
+
         return {"FINISHED"}
 
     def draw(self, context):
@@ -126,14 +257,22 @@ class BastiScatterDuplicate(bpy.types.Operator):
         layout.use_property_split = True
         layout.use_property_decorate = False
         layout.prop(self, "count")
-        layout.prop(self, "offset")
-        layout.prop(self, "add_negative_offset")
+        layout.prop(self, "placement")
+        if self.placement == "RANDOM":
+            layout.prop(self, "offset")
+            layout.prop(self, "add_negative_offset")
+        else:
+            layout.prop(self, "min_distance")
+            layout.prop(self, "align_to_normal")
         layout.prop(self, "rotation")
         layout.prop(self, "add_negative_rotation")
         layout.prop(self, "seed")
 
+        layout.prop(self, "output")
+
         selection_mode = get_mesh_selection_mode(context)
         if selection_mode == "OBJECT":
-            layout.prop(self, "linked")
+            if self.output == "COPIES":
+                layout.prop(self, "linked")
         else:
             layout.prop(self, "islands")
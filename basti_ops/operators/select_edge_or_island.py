@@ -1,11 +1,12 @@
 import bpy
 
+from ..utils.edit_mesh import EditMeshSession
 from ..utils.selection import (
     get_mesh_selection_mode,
     select_by_id,
-    set_mesh_selection_mode,
-    get_linked_verts,
-    get_selected,
+    MeshSelectionModeState,
+    get_island_vert_ids,
+    get_selected_ids,
 )
 
 
@@ -36,13 +37,17 @@ class BastiSelectEdgeOrIsland(bpy.types.Operator):
             return {"FINISHED"}
 
         obj = context.active_object
-        select_by_id(
-            obj,
-            "VERT",
-            get_linked_verts(obj, get_index=True),
-            clear_selection=False,
-        )
+        with MeshSelectionModeState(context), EditMeshSession(obj) as session:
+            select_by_id(
+                obj,
+                "VERT",
+                get_island_vert_ids(
+                    obj,
+                    get_selected_ids(obj, "VERT", none_is_all=True, session=session),
+                    session=session,
+                ).tolist(),
+                clear_selection=False,
+                session=session,
+            )
 
-        set_mesh_selection_mode("OBJECT")
-        set_mesh_selection_mode(selection_mode)
         return {"FINISHED"}
@@ -0,0 +1,83 @@
+import bpy
+import numpy as np
+
+from ..utils.edit_mesh import EditMeshSession
+from ..utils.selection import get_selected_ids, set_selection_by_id
+from ..utils.symmetry import (
+    MIRROR_AXIS_ITEMS,
+    MIRROR_ORIENTATION_ITEMS,
+    MIRROR_PIVOT_ITEMS,
+    get_mirror_plane,
+    get_symmetry_map,
+)
+
+
+class BastiSelectMirror(bpy.types.Operator):
+    """.select_mirror
+    Select the mirror partners of the selected vertices.
+    Partners are found once per mesh and plane and reused until the mesh changes.
+    * Axis: the axis to mirror on
+    * Orientation: the orientation of the axis, or the plane of the active face
+    * Pivot: the pivot to mirror across
+    * Extend: keep the current selection and add the partners
+    * Distance: how far a mirrored vertex may be from its partner
+    """
+
+    bl_idname = "basti.select_mirror"
+    bl_label = "Select Mirror"
+    bl_options = {"REGISTER", "UNDO"}
+
+    axis: bpy.props.EnumProperty(
+        name="Axis",
+        items=MIRROR_AXIS_ITEMS,
+        default="X",
+    )
+    orientation: bpy.props.EnumProperty(
+        name="Orientation",
+        items=MIRROR_ORIENTATION_ITEMS,
+        default="GLOBAL",
+    )
+    pivot: bpy.props.EnumProperty(
+        name="Pivot",
+        items=MIRROR_PIVOT_ITEMS,
+        default="ORIGIN",
+    )
+    extend: bpy.props.BoolProperty(
+        name="Extend",
+        default=True,
+    )
+    distance: bpy.props.FloatProperty(
+        name="Distance",
+        default=0.0001,
+        min=0.0,
+    )
+
+    @classmethod
+    def poll(cls, context):
+        return (
+            context.active_object is not None
+            and context.active_object.type == "MESH"
+            and context.active_object.mode == "EDIT"
+        )
+
+    def execute(self, context):
+        obj = context.active_object
+        with EditMeshSession(obj) as session:
+            plane = get_mirror_plane(
+                context, obj, session.bm, self.axis, self.orientation, self.pivot
+            )
+            if plane is None:
+                self.report({"WARNING"}, "No plane to mirror across")
+                return {"CANCELLED"}
+
+            selected_ids = get_selected_ids(obj, "VERT", session=session)
+            partners = get_symmetry_map(
+                obj, *plane, self.distance, session, vert_ids=selected_ids
+            )
+            partner_ids = partners[selected_ids]
+            partner_ids = partner_ids[partner_ids >= 0]
+            if self.extend:
+                partner_ids = np.union1d(selected_ids, partner_ids)
+            set_selection_by_id(session, "VERT", partner_ids)
+
+        return {"FINISHED"}
@@ -1,15 +1,19 @@
 import bmesh
 import bpy
-from mathutils import Vector, Euler
+from mathutils import Vector
 
 from ..utils.object import (
-    align_euler_axis_with_direction,
     get_average_object_location,
     get_average_object_rotation_euler,
-    set_object_location,
-    set_object_rotation_euler,
+    get_rotation_aligned_with_direction,
+    set_object_transforms,
+)
+from ..utils.mesh import (
+    get_average_location,
+    get_average_normal,
+    get_element_direction,
+    get_world_bounding_box,
 )
-from ..utils.mesh import get_average_location, get_average_normal, get_element_direction
 from ..utils.selection import (
     get_mesh_selection_mode,
     get_selected,
@@ -55,29 +59,12 @@ class BastiSetPivot(bpy.types.Operator):
     )
     orient: bpy.props.BoolProperty(default=False)
 
-    @staticmethod
-    def set_location(objs: list[bpy.types.Object], location: Vector):
-        for obj in objs:
-            set_object_location(obj, location, True)
-
-    @staticmethod
-    def set_rotation(objs: list[bpy.types.Object], rotation: Euler):
-        for obj in objs:
-            set_object_rotation_euler(obj, rotation, True)
-
-    @staticmethod
-    def set_direction(obj: bpy.types.Object, direction: Vector, axis: int):
-        set_mesh_selection_mode("OBJECT")
-        rotation_offset = align_euler_axis_with_direction(obj, axis, direction)
-        bm = bmesh.new()
-        bm.from_mesh(obj.data)
-        bm.verts.ensure_lookup_table()
-        for vert in obj.data.vertices:
-            vert_loc = vert.co.copy()
-            vert_loc.rotate(rotation_offset.inverted())
-            vert.co = vert_loc
-        bm.to_mesh(obj.data)
-        bm.free()
+    def report_overruled(self, overruled: list[bpy.types.Object]):
+        if overruled:
+            self.report(
+                {"WARNING"},
+                f"{len(overruled)} linked objects kept the pivot of their shared mesh",
+            )
 
     def execute(self, context):
         selection_mode = get_mesh_selection_mode(context)
@@ -112,15 +99,26 @@ class BastiSetPivot(bpy.types.Operator):
         set_mesh_selection_mode("OBJECT")
 
         if target_location:
-            self.set_location(objs, target_location)
-            if target_rotation:
-                self.set_rotation(objs, target_rotation)
+            overruled = set_object_transforms(
+                objs,
+                [target_location] * len(objs),
+                [target_rotation] * len(objs) if target_rotation else None,
+            )
+            self.report_overruled(overruled)
             return {"FINISHED"}
 
-        target_direction_z = None
-        target_direction_y = None
+        depsgraph = (
+            context.evaluated_depsgraph_get() if self.target.startswith("BB_") else None
+        )
+        target_objs = []
+        target_locations = []
+        target_rotations = []
 
         for obj in objs:
+            target_location = None
+            target_direction_z = None
+            target_direction_y = None
+
             if self.target == "ACTIVE":
                 bm = bmesh.new()
                 bm.from_mesh(obj.data)
@@ -159,19 +157,7 @@ class BastiSetPivot(bpy.types.Operator):
                         )
 
             if self.target.startswith("BB_"):
-                starting_coords = obj.matrix_world @ obj.data.vertices[0].co.copy()
-                bounding_box = (
-                    starting_coords,
-                    starting_coords.copy(),
-                )
-                for vert in obj.data.vertices:
-                    coords = obj.matrix_world @ vert.co.copy()
-                    bounding_box[0].x = min(bounding_box[0].x, coords.x)
-                    bounding_box[0].y = min(bounding_box[0].y, coords.y)
-                    bounding_box[0].z = min(bounding_box[0].z, coords.z)
-                    bounding_box[1].x = max(bounding_box[1].x, coords.x)
-                    bounding_box[1].y = max(bounding_box[1].y, coords.y)
-                    bounding_box[1].z = max(bounding_box[1].z, coords.z)
+                bounding_box = get_world_bounding_box(obj, obj.evaluated_get(depsgraph))
 
                 bounding_box_center = bounding_box[0].copy()
                 bounding_box_center += (bounding_box[1] - bounding_box[0]) / 2
@@ -197,11 +183,24 @@ class BastiSetPivot(bpy.types.Operator):
                     target_location = bounding_box_center
                     target_location.x = bounding_box[1].x
 
-            if target_location:
-                self.set_location([obj], target_location)
+            if not target_location and not target_direction_z:
+                continue
+
+            target_rotation = None
             if target_direction_z:
-                self.set_direction(obj, target_direction_z, 2)
+                target_rotation, _ = get_rotation_aligned_with_direction(
+                    obj.rotation_euler, 2, target_direction_z
+                )
                 if target_direction_y:
-                    self.set_direction(obj, target_direction_y, 1)
-
+                    target_rotation, _ = get_rotation_aligned_with_direction(
+                        target_rotation, 1, target_direction_y
+                    )
+            target_objs.append(obj)
+            target_locations.append(target_location)
+            target_rotations.append(target_rotation)
+
+        overruled = set_object_transforms(
+            target_objs, target_locations, target_rotations
+        )
+        self.report_overruled(overruled)
         return {"FINISHED"}
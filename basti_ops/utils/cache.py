@@ -0,0 +1,71 @@
+from collections import OrderedDict
+from hashlib import blake2b
+from typing import Any, Callable, Hashable, Optional
+
+import numpy as np
+
+
+class LRUCache:
+    """Keeps the most recently used values up to a maximum count and optionally a maximum memory size.
+    The size of a value is its nbytes, e.g. of a numpy array, values without one count as empty.
+    The most recent value is always kept, even if it is bigger than the maximum on its own
+    """
+
+    def __init__(self, max_size: int = 8, max_bytes: Optional[int] = None):
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._values: OrderedDict[Hashable, Any] = OrderedDict()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._values
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        if key not in self._values:
+            return default
+        self._values.move_to_end(key)
+        return self._values[key]
+
+    def set(self, key: Hashable, value: Any):
+        if key in self._values:
+            self.nbytes -= get_nbytes(self._values.pop(key))
+        self._values[key] = value
+        self.nbytes += get_nbytes(value)
+        while len(self._values) > 1 and (
+            len(self._values) > self.max_size
+            or (self.max_bytes is not None and self.nbytes > self.max_bytes)
+        ):
+            _, evicted = self._values.popitem(last=False)
+            self.nbytes -= get_nbytes(evicted)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Returns the cached value or computes and caches it"""
+        if key in self._values:
+            return self.get(key)
+        value = compute()
+        self.set(key, value)
+        return value
+
+    def clear(self):
+        self._values.clear()
+        self.nbytes = 0
+
+
+def get_nbytes(value: Any) -> int:
+    """Returns the memory size of the value or of the arrays in a tuple of values"""
+    if isinstance(value, tuple):
+        return sum(get_nbytes(v) for v in value)
+    return getattr(value, "nbytes", 0)
+
+
+def get_array_hash(*arrays: np.ndarray) -> str:
+    """Returns a digest of the shape, type and contents of the arrays"""
+    digest = blake2b(digest_size=16)
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(f"{array.dtype}{array.shape}".encode())
+        digest.update(array.view(np.uint8))
+    return digest.hexdigest()
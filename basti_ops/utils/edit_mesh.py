@@ -0,0 +1,93 @@
+from contextlib import contextmanager
+from typing import Optional, Iterator
+
+import bpy
+import bmesh
+import numpy as np
+
+from .topology import get_edge_vertex_array, label_islands
+
+
+class EditMeshSession:
+    """Shares the edit-mode BMesh of an object between utility calls of one operator run.
+    Lookup tables and derived topology are built once and the edit mesh is updated once on exit.
+    Code changing the BMesh has to call tag_update so cached data is rebuilt when needed
+    """
+
+    def __init__(self, obj: bpy.types.Object):
+        self.obj = obj
+        self.bm: Optional[bmesh.types.BMesh] = None
+        self.needs_update = False
+        self.destructive = False
+        self._lookup_valid = False
+        self._synced = False
+        self._island_labels: Optional[np.ndarray] = None
+
+    def __enter__(self) -> "EditMeshSession":
+        self.bm = bmesh.from_edit_mesh(self.obj.data)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.needs_update and self.bm.is_valid:
+            bmesh.update_edit_mesh(self.obj.data, destructive=self.destructive)
+        self.bm = None
+        return False
+
+    def ensure_lookup_tables(self):
+        """Ensure the index lookup tables of verts, edges and faces"""
+        if self._lookup_valid:
+            return
+        self.bm.verts.ensure_lookup_table()
+        self.bm.edges.ensure_lookup_table()
+        self.bm.faces.ensure_lookup_table()
+        self._lookup_valid = True
+
+    def tag_update(self, destructive: bool = False):
+        """Mark the BMesh as changed, destructive changes add or remove elements"""
+        self.needs_update = True
+        self._synced = False
+        if destructive:
+            self.destructive = True
+            self._lookup_valid = False
+            self._island_labels = None
+
+    def update_indices(self):
+        """Renumber the elements after adding or removing geometry"""
+        self.bm.verts.index_update()
+        self.bm.edges.index_update()
+        self.bm.faces.index_update()
+
+    def sync(self):
+        """Write the BMesh to the mesh data, so bulk reads from the mesh match the BMesh indices"""
+        if self._synced:
+            return
+        self.update_indices()
+        self.obj.update_from_editmode()
+        self._synced = True
+
+    @property
+    def synced(self) -> bool:
+        """Whether the mesh data matches the BMesh, so it can be read without writing the edit mesh first"""
+        return self._synced
+
+    @property
+    def island_labels(self) -> np.ndarray:
+        """An island id per vertex"""
+        if self._island_labels is None:
+            self.sync()
+            self._island_labels = label_islands(
+                get_edge_vertex_array(self.obj.data), len(self.obj.data.vertices)
+            )
+        return self._island_labels
+
+
+@contextmanager
+def edit_mesh_session(
+    obj: bpy.types.Object, session: Optional[EditMeshSession] = None
+) -> Iterator[EditMeshSession]:
+    """Use the given session or open a temporary one for the object"""
+    if session is not None:
+        yield session
+        return
+    with EditMeshSession(obj) as new_session:
+        yield new_session
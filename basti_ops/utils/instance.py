@@ -0,0 +1,120 @@
+from typing import Optional
+
+import bpy
+import bmesh
+import numpy as np
+from mathutils import Matrix
+
+from .mesh import get_bmesh_geometry
+from .object import add_new_mesh_object
+
+INSTANCER_NODE_GROUP = "basti_instance_on_points"
+INSTANCE_TRANSFORM_ATTRIBUTE = "instance_transform"
+
+# output options of the operators that can create copies or instances
+OUTPUT_ITEMS = [
+    ("COPIES", "Copies", "Create real copies"),
+    ("INSTANCES", "Instances", "Create one object instancing the selection"),
+]
+
+
+def get_instancer_node_group() -> bpy.types.GeometryNodeTree:
+    """Returns the node group instancing an object on the points of the geometry.
+    Every instance gets the matrix stored in the instance transform attribute of its point
+    """
+    node_group = bpy.data.node_groups.get(INSTANCER_NODE_GROUP)
+    if node_group:
+        return node_group
+
+    node_group = bpy.data.node_groups.new(INSTANCER_NODE_GROUP, "GeometryNodeTree")
+    node_group.interface.new_socket(
+        "Geometry", in_out="INPUT", socket_type="NodeSocketGeometry"
+    )
+    node_group.interface.new_socket(
+        "Object", in_out="INPUT", socket_type="NodeSocketObject"
+    )
+    node_group.interface.new_socket(
+        "Geometry", in_out="OUTPUT", socket_type="NodeSocketGeometry"
+    )
+
+    nodes = node_group.nodes
+    group_input = nodes.new("NodeGroupInput")
+    group_output = nodes.new("NodeGroupOutput")
+    object_info = nodes.new("GeometryNodeObjectInfo")
+    object_info.transform_space = "ORIGINAL"
+    object_info.inputs["As Instance"].default_value = True
+    instance_on_points = nodes.new("GeometryNodeInstanceOnPoints")
+    named_attribute = nodes.new("GeometryNodeInputNamedAttribute")
+    named_attribute.data_type = "FLOAT4X4"
+    named_attribute.inputs["Name"].default_value = INSTANCE_TRANSFORM_ATTRIBUTE
+    set_transform = nodes.new("GeometryNodeSetInstanceTransform")
+
+    links = node_group.links
+    links.new(group_input.outputs["Geometry"], instance_on_points.inputs["Points"])
+    links.new(group_input.outputs["Object"], object_info.inputs["Object"])
+    links.new(object_info.outputs["Geometry"], instance_on_points.inputs["Instance"])
+    links.new(
+        instance_on_points.outputs["Instances"], set_transform.inputs["Instances"]
+    )
+    links.new(named_attribute.outputs["Attribute"], set_transform.inputs["Transform"])
+    links.new(set_transform.outputs["Instances"], group_output.inputs["Geometry"])
+
+    for i, node in enumerate(
+        (group_input, object_info, instance_on_points, set_transform, group_output)
+    ):
+        node.location = (i * 200.0, 0.0)
+    named_attribute.location = (400.0, -200.0)
+    return node_group
+
+
+def add_object_instances(
+    obj: bpy.types.Object, matrices: list[Matrix], name: Optional[str] = None
+) -> bpy.types.Object:
+    """Add a point object next to the object, instancing it once per world matrix"""
+    instancer = add_new_mesh_object(
+        name or f"{obj.name}_instances", select=False, set_active=False, next_to_obj=obj
+    )
+    transforms = np.array(matrices, dtype=np.float32).reshape(-1, 4, 4)
+
+    mesh = instancer.data
+    mesh.vertices.add(len(transforms))
+    mesh.vertices.foreach_set("co", transforms[:, :3, 3].ravel())
+    attribute = mesh.attributes.new(INSTANCE_TRANSFORM_ATTRIBUTE, "FLOAT4X4", "POINT")
+    # matrix attributes are stored column major
+    attribute.data.foreach_set("value", transforms.transpose(0, 2, 1).ravel())
+    mesh.update()
+
+    node_group = get_instancer_node_group()
+    modifier = instancer.modifiers.new("Instances", "NODES")
+    modifier.node_group = node_group
+    modifier[node_group.interface.items_tree["Object"].identifier] = obj
+    return instancer
+
+
+def add_geometry_instances(
+    obj: bpy.types.Object,
+    bm: bmesh.types.BMesh,
+    verts: list[bmesh.types.BMVert],
+    matrices: list[Matrix],
+    world_space: bool = True,
+) -> bpy.types.Object:
+    """Instance the geometry spanned by the verts once per matrix.
+    The geometry is copied into a new object that isn't linked to the scene and only serves as instance source.
+    The matrices are in world space or in the local space of the object, like in replicate_bmesh_geometry
+    """
+    name = f"{obj.name}_instance_source"
+    source = bpy.data.objects.new(name, bpy.data.meshes.new(name))
+    for material in obj.data.materials:
+        source.data.materials.append(material)
+
+    bm_source = bmesh.new()
+    bmesh.ops.duplicate(bm, geom=get_bmesh_geometry(verts), dest=bm_source)
+    bm_source.to_mesh(source.data)
+    bm_source.free()
+
+    matrix_world = obj.matrix_world
+    if world_space:
+        matrices = [m @ matrix_world for m in matrices]
+    else:
+        matrices = [matrix_world @ m for m in matrices]
+    return add_object_instances(source, matrices, f"{obj.name}_instances")
@@ -2,9 +2,12 @@ from typing import Literal, Union, Optional, Sequence
 
 import bpy
 import bmesh
-from mathutils import Vector, Quaternion, Euler
+import numpy as np
+from mathutils import Vector, Quaternion, Euler, Matrix
+from mathutils.kdtree import KDTree
 
 from .object import duplicate_object
+from .topology import get_edge_vertex_array, get_polygon_vertex_array, get_csr_rows
 from .selection import (
     get_mesh_selection_mode,
     get_selected_vertices,
@@ -48,79 +51,188 @@ def join_meshes(objs: list[bpy.types.Object]) -> bpy.types.Object:
     return obj_target
 
 
-def convert_elements_to_verts(
+MeshElements = Union[
+    list[bpy.types.MeshVertex],
+    list[bmesh.types.BMVert],
+    list[bpy.types.MeshEdge],
+    list[bmesh.types.BMEdge],
+    list[bpy.types.MeshPolygon],
+    list[bmesh.types.BMFace],
+    np.ndarray,
+    list[int],
+]
+
+
+def is_index_array(elements: MeshElements) -> bool:
+    """Returns whether the elements are given as plain indices"""
+    return (
+        isinstance(elements, np.ndarray)
+        or len(elements) == 0
+        or isinstance(elements[0], (int, np.integer))
+    )
+
+
+def get_element_type(elements: MeshElements) -> Literal["VERT", "EDGE", "FACE"]:
+    """Returns the element type of a list of mesh or BMesh elements"""
+    element = elements[0]
+    if isinstance(element, (bpy.types.MeshVertex, bmesh.types.BMVert)):
+        return "VERT"
+    if isinstance(element, (bpy.types.MeshEdge, bmesh.types.BMEdge)):
+        return "EDGE"
+    return "FACE"
+
+
+def get_element_vert_ids(
+    elements: MeshElements,
+    obj: bpy.types.Object,
+    element_type: Literal["VERT", "EDGE", "FACE"] = "VERT",
+) -> np.ndarray:
+    """Returns the sorted unique vertex indices used by mesh elements or element indices"""
+    if not is_index_array(elements):
+        element_type = get_element_type(elements)
+        elements = [e.index for e in elements]
+    element_ids = np.asarray(elements, dtype=np.int64)
+
+    if element_type == "VERT":
+        vert_ids = element_ids
+    elif element_type == "EDGE":
+        vert_ids = get_edge_vertex_array(obj.data)[element_ids].ravel()
+    else:
+        vert_ids = get_csr_rows(*get_polygon_vertex_array(obj.data), element_ids)
+    return np.unique(vert_ids)
+
+
+def get_unique_bm_verts(
     elements: Union[
-        list[bpy.types.MeshVertex],
-        list[bmesh.types.BMVert],
-        list[bpy.types.MeshEdge],
-        list[bmesh.types.BMEdge],
-        list[bpy.types.MeshPolygon],
-        list[bmesh.types.BMFace],
+        list[bmesh.types.BMVert], list[bmesh.types.BMEdge], list[bmesh.types.BMFace]
     ],
-    obj: Optional[bpy.types.Object] = None,
-) -> Union[list[bpy.types.MeshVertex], list[bmesh.types.BMVert]]:
-    if any(
-        isinstance(elements[0], vert_type)
-        for vert_type in (bpy.types.MeshVertex, bmesh.types.BMVert)
+) -> list[bmesh.types.BMVert]:
+    """Returns the verts of the BMesh elements without duplicates, keeping their order"""
+    if isinstance(elements[0], bmesh.types.BMVert):
+        return list(dict.fromkeys(elements))
+    return list(dict.fromkeys(v for e in elements for v in e.verts))
+
+
+def get_mesh_vertex_vectors(
+    mesh: bpy.types.Mesh,
+    attribute: Literal["co", "normal"] = "co",
+    vert_ids: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Returns vertex coordinates or normals as an (n, 3) array"""
+    vectors = np.zeros(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get(attribute, vectors)
+    vectors = vectors.reshape(-1, 3)
+    return vectors if vert_ids is None else vectors[vert_ids]
+
+
+def get_element_vert_vectors(
+    elements: MeshElements,
+    obj: Optional[bpy.types.Object],
+    attribute: Literal["co", "normal"],
+    element_type: Literal["VERT", "EDGE", "FACE"] = "VERT",
+) -> np.ndarray:
+    """Returns the coordinates or normals of the unique verts of the elements as an (n, 3) array"""
+    if not is_index_array(elements) and isinstance(
+        elements[0], (bmesh.types.BMVert, bmesh.types.BMEdge, bmesh.types.BMFace)
     ):
-        return elements
+        return np.array(
+            [getattr(v, attribute)[:] for v in get_unique_bm_verts(elements)]
+        )
 
-    if any(
-        isinstance(elements[0], bm_type)
-        for bm_type in (bmesh.types.BMEdge, bmesh.types.BMFace)
+    if not obj:
+        if not is_index_array(elements) and isinstance(
+            elements[0], bpy.types.MeshVertex
+        ):
+            return np.array([getattr(v, attribute)[:] for v in dict.fromkeys(elements)])
+        raise ValueError("Need object to resolve to vertices, but None was given")
+
+    return get_mesh_vertex_vectors(
+        obj.data, attribute, get_element_vert_ids(elements, obj, element_type)
+    )
+
+
+def convert_elements_to_verts(
+    elements: MeshElements,
+    obj: Optional[bpy.types.Object] = None,
+    element_type: Literal["VERT", "EDGE", "FACE"] = "VERT",
+) -> Union[list[bpy.types.MeshVertex], list[bmesh.types.BMVert]]:
+    """Returns the unique verts of the elements"""
+    if not is_index_array(elements) and isinstance(
+        elements[0], (bmesh.types.BMVert, bmesh.types.BMEdge, bmesh.types.BMFace)
     ):
-        return [v for e in elements for v in e.verts]
+        return get_unique_bm_verts(elements)
 
     if not obj:
+        if not is_index_array(elements) and isinstance(
+            elements[0], bpy.types.MeshVertex
+        ):
+            return list(dict.fromkeys(elements))
         raise ValueError("Need object to resolve to vertices, but None was given")
 
-    return [obj.data.vertices[i] for e in elements for i in e.vertices]
+    vertices = obj.data.vertices
+    return [
+        vertices[i] for i in get_element_vert_ids(elements, obj, element_type).tolist()
+    ]
 
 
 def get_average_location(
-    elements: Union[
-        list[bpy.types.MeshVertex],
-        list[bmesh.types.BMVert],
-        list[bpy.types.MeshEdge],
-        list[bmesh.types.BMEdge],
-        list[bpy.types.MeshPolygon],
-        list[bmesh.types.BMFace],
-    ],
+    elements: MeshElements,
     obj: Optional[bpy.types.Object] = None,
+    element_type: Literal["VERT", "EDGE", "FACE"] = "VERT",
 ) -> Vector:
-    """Return the average vert location"""
-    verts = convert_elements_to_verts(elements, obj)
-
-    location = Vector.Fill(3)
-    for v in verts:
-        location += v.co.copy()
-    location /= len(verts)
+    """Return the average location of the unique verts of the elements.
+    Index arrays are read as element_type indices of the object's mesh"""
+    if len(elements) == 0:
+        raise ValueError("Need elements to average their location, but none were given")
+    coords = get_element_vert_vectors(elements, obj, "co", element_type)
+    location = Vector(coords.mean(axis=0, dtype=np.float64))
     return obj.matrix_world @ location if obj else location
 
 
 def get_average_normal(
-    elements: Union[
-        list[bpy.types.MeshVertex],
-        list[bmesh.types.BMVert],
-        list[bpy.types.MeshEdge],
-        list[bmesh.types.BMEdge],
-        list[bpy.types.MeshPolygon],
-        list[bmesh.types.BMFace],
-    ],
+    elements: MeshElements,
     obj: Optional[bpy.types.Object] = None,
+    element_type: Literal["VERT", "EDGE", "FACE"] = "VERT",
 ) -> Vector:
-    """Return the average normal"""
-    verts = convert_elements_to_verts(elements, obj)
-
-    normal = Vector.Fill(3)
-    for v in verts:
-        normal += v.normal.copy()
+    """Return the average normal of the unique verts of the elements.
+    Index arrays are read as element_type indices of the object's mesh"""
+    if len(elements) == 0:
+        raise ValueError("Need elements to average their normal, but none were given")
+    normals = get_element_vert_vectors(elements, obj, "normal", element_type)
+    normal = Vector(normals.sum(axis=0, dtype=np.float64))
     if obj:
         matrix = obj.matrix_world.to_3x3()
         normal = matrix @ normal
     return normal.normalized()
 
 
+def is_axis_aligned_matrix(matrix: Matrix, tolerance: float = 0.000001) -> bool:
+    """Returns whether the matrix maps axis aligned boxes onto axis aligned boxes"""
+    return all(
+        sum(abs(value) > tolerance for value in row) == 1 for row in matrix.to_3x3()
+    )
+
+
+def get_world_bounding_box(
+    obj: bpy.types.Object, obj_evaluated: Optional[bpy.types.Object] = None
+) -> tuple[Vector, Vector]:
+    """Returns the world space minimum and maximum corner of the object's mesh data.
+    The evaluated object's bounding box is used, if it matches the mesh data and stays axis aligned
+    """
+    matrix = obj.matrix_world
+    if (
+        obj_evaluated
+        and not obj.modifiers
+        and not obj.data.shape_keys
+        and is_axis_aligned_matrix(matrix)
+    ):
+        coords = np.array([matrix @ Vector(c) for c in obj_evaluated.bound_box])
+    else:
+        coords = get_mesh_vertex_vectors(obj.data) @ np.array(matrix.to_3x3()).T
+        coords += np.array(matrix.translation)
+    return Vector(coords.min(axis=0)), Vector(coords.max(axis=0))
+
+
 def copy_selected_into_new_obj(obj: bpy.types.Mesh, cut: bool) -> bpy.types.Mesh:
     """Copies or cuts selected faces of the mesh into a temporary mesh"""
     polys_selected = get_selected_polygons(obj)
@@ -170,17 +282,25 @@ def copy_selected_into_new_obj(obj: bpy.types.Mesh, cut: bool) -> bpy.types.Mesh
     return obj_target
 
 
-def duplicate_bmesh_geometry(
-    bm: bmesh.types.BMesh, verts: list[bmesh.types.BMVert], flip_result: bool = False
-) -> list[bmesh.types.BMVert]:
-    geom = []
-    geom.extend(verts.copy())
+def get_bmesh_geometry(
+    verts: list[bmesh.types.BMVert],
+) -> list[Union[bmesh.types.BMVert, bmesh.types.BMEdge, bmesh.types.BMFace]]:
+    """Returns the verts with all edges and faces spanned by them"""
+    vert_set = set(verts)
+    geom = list(verts)
     linked_edges = {edge for v in verts for edge in v.link_edges}
-    geom.extend({e for e in linked_edges if all(v in verts for v in e.verts)})
+    geom.extend(e for e in linked_edges if all(v in vert_set for v in e.verts))
     linked_faces = {face for v in verts for face in v.link_faces}
-    geom.extend({f for f in linked_faces if all(v in verts for v in f.verts)})
+    geom.extend(f for f in linked_faces if all(v in vert_set for v in f.verts))
+    return geom
+
 
-    duplication_result = bmesh.ops.duplicate(bm, geom=geom)
+def duplicate_bmesh_geometry_with_map(
+    bm: bmesh.types.BMesh, verts: list[bmesh.types.BMVert], flip_result: bool = False
+) -> tuple[list[bmesh.types.BMVert], dict[bmesh.types.BMVert, bmesh.types.BMVert]]:
+    """Duplicate the geometry spanned by the verts.
+    Returns the new verts and a map from the source verts to their copies"""
+    duplication_result = bmesh.ops.duplicate(bm, geom=get_bmesh_geometry(verts))
     bm.verts.ensure_lookup_table()
     if flip_result:
         bmesh.ops.reverse_faces(
@@ -191,7 +311,81 @@ def duplicate_bmesh_geometry(
                 if isinstance(g, bmesh.types.BMFace)
             ],
         )
-    return [g for g in duplication_result["geom"] if isinstance(g, bmesh.types.BMVert)]
+    new_verts = [
+        g for g in duplication_result["geom"] if isinstance(g, bmesh.types.BMVert)
+    ]
+    vert_map = {v: duplication_result["vert_map"][v] for v in verts}
+    return new_verts, vert_map
+
+
+def duplicate_bmesh_geometry(
+    bm: bmesh.types.BMesh, verts: list[bmesh.types.BMVert], flip_result: bool = False
+) -> list[bmesh.types.BMVert]:
+    return duplicate_bmesh_geometry_with_map(bm, verts, flip_result)[0]
+
+
+def replicate_bmesh_geometry(
+    bm: bmesh.types.BMesh,
+    verts: list[bmesh.types.BMVert],
+    matrices: list[Matrix],
+    obj: Optional[bpy.types.Object] = None,
+) -> list[list[bmesh.types.BMVert]]:
+    """Duplicate the geometry spanned by the verts once per matrix and transform each copy by it.
+    The copies are duplicated in doubling batches, so n copies take about log2(n) duplicate calls.
+    The matrices are in world space if the object is given, otherwise in local space.
+    Returns the verts of every copy. The lookup tables are invalid afterwards"""
+    geom = get_bmesh_geometry(verts)
+    vert_count = len(verts)
+    if obj:
+        matrix_world = obj.matrix_world
+        matrix_world_inverted = matrix_world.inverted()
+        matrices = [matrix_world_inverted @ m @ matrix_world for m in matrices]
+
+    copies = []
+    while len(copies) < len(matrices):
+        # duplicate the source first, then as many of the copies as are still missing at once
+        batch = copies[: len(matrices) - len(copies)] or [geom]
+        duplication_result = bmesh.ops.duplicate(
+            bm, geom=[element for copy in batch for element in copy]
+        )
+        element_map = {
+            **duplication_result["vert_map"],
+            **duplication_result["edge_map"],
+            **duplication_result["face_map"],
+        }
+        copies.extend([element_map[element] for element in copy] for copy in batch)
+
+    new_verts = []
+    for copy, matrix in zip(copies, matrices):
+        copy_verts = copy[:vert_count]
+        bmesh.ops.transform(bm, matrix=matrix, verts=copy_verts)
+        new_verts.append(copy_verts)
+    return new_verts
+
+
+def weld_verts_by_distance(
+    bm: bmesh.types.BMesh,
+    verts: list[bmesh.types.BMVert],
+    targets: list[bmesh.types.BMVert],
+    distance: float,
+) -> int:
+    """Weld every vert onto the closest target within the distance, using a KD-tree of the targets.
+    Returns how many verts were welded"""
+    if not verts or not targets:
+        return 0
+    kd = KDTree(len(targets))
+    for i, target in enumerate(targets):
+        kd.insert(target.co, i)
+    kd.balance()
+
+    target_map = {}
+    for vert in verts:
+        _, index, found_distance = kd.find(vert.co)
+        if index is not None and found_distance <= distance:
+            target_map[vert] = targets[index]
+    if target_map:
+        bmesh.ops.weld_verts(bm, targetmap=target_map)
+    return len(target_map)
 
 
 def rotate_vertices(
@@ -216,6 +410,15 @@ def rotate_vertices(
         vert.co = location
 
 
+def update_vertex_normals(verts: list[bmesh.types.BMVert]):
+    """Recalculate the normals of the verts and their faces, instead of all normals of the BMesh"""
+    faces = {f for v in verts for f in v.link_faces}
+    for face in faces:
+        face.normal_update()
+    for vert in verts:
+        vert.normal_update()
+
+
 def get_element_direction(
     obj: bpy.types.Object,
     element: Union[
@@ -1,16 +1,14 @@
 from typing import Optional, Literal, Union
 
 import bpy
-import bmesh
-from mathutils import Vector, Euler, Quaternion
+from mathutils import Vector, Euler, Quaternion, Matrix
 
 from .selection import (
     get_selected_polygons,
     get_selected_vertices,
     add_vertices_from_polygons,
     select_objects,
-    get_mesh_selection_mode,
-    set_mesh_selection_mode,
+    MeshSelectionModeState,
 )
 
 
@@ -20,18 +18,39 @@ def delete_objects(objs: list[bpy.types.Object]):
         bpy.ops.object.delete()
 
 
+def duplicate_objects(
+    obj: bpy.types.Object, count: int = 1, linked: bool = False
+) -> list[bpy.types.Object]:
+    """Create count copies of the object in the collections of the object.
+    The copies share the object data when linked, otherwise each gets its own copy.
+    Like the duplicate operator, the copies end up selected instead of the object and the last one active
+    """
+    if obj.mode == "EDIT":
+        obj.update_from_editmode()
+    collections = obj.users_collection or [bpy.context.scene.collection]
+
+    new_objs = []
+    for _ in range(count):
+        new_obj = obj.copy()
+        if obj.data and not linked:
+            new_obj.data = obj.data.copy()
+        for collection in collections:
+            collection.objects.link(new_obj)
+        new_objs.append(new_obj)
+
+    if new_objs:
+        obj.select_set(False)
+        for new_obj in new_objs:
+            new_obj.select_set(True)
+        bpy.context.view_layer.objects.active = new_objs[-1]
+    return new_objs
+
+
 def duplicate_object(
     obj: bpy.types.Object, instance: bool = False
 ) -> Optional[bpy.types.Object]:
     """Duplicate the object"""
-    selection_mode = get_mesh_selection_mode(bpy.context)
-    set_mesh_selection_mode("OBJECT")
-    objs_before = set(bpy.context.scene.objects)
-    with bpy.context.temp_override(active_object=obj, selected_objects=[obj]):
-        bpy.ops.object.duplicate(linked=instance)
-    objs_after = set(bpy.context.scene.objects)
-    new_objs = list(objs_after - objs_before)
-    set_mesh_selection_mode(selection_mode)
+    new_objs = duplicate_objects(obj, 1, instance)
     return new_objs[0] if new_objs else None
 
 
@@ -52,9 +71,10 @@ def get_evaluated_obj_and_selection(
     return obj_evaluated, verts_selected, polys_selected
 
 
-def align_euler_axis_with_direction(
-    obj, axis: Union[int, Literal["x", "y", "z"]], direction: Vector
-) -> Quaternion:
+def get_rotation_aligned_with_direction(
+    rotation: Euler, axis: Union[int, Literal["x", "y", "z"]], direction: Vector
+) -> tuple[Euler, Quaternion]:
+    """Returns the rotation turned so its axis points along the direction and the rotation difference"""
     if not isinstance(axis, int):
         if axis == "x":
             axis = 0
@@ -65,10 +85,18 @@ def align_euler_axis_with_direction(
     axis_vector = Vector.Fill(3)
     axis_vector[axis] = 1.0
 
-    obj_matrix = obj.rotation_euler.to_matrix()
-    obj_axis = obj_matrix @ axis_vector
-    rotation_diff = obj_axis.rotation_difference(direction.normalized())
-    obj.rotation_euler = (rotation_diff.to_matrix() @ obj_matrix).to_euler()
+    rotation_matrix = rotation.to_matrix()
+    rotation_axis = rotation_matrix @ axis_vector
+    rotation_diff = rotation_axis.rotation_difference(direction.normalized())
+    return (rotation_diff.to_matrix() @ rotation_matrix).to_euler(), rotation_diff
+
+
+def align_euler_axis_with_direction(
+    obj, axis: Union[int, Literal["x", "y", "z"]], direction: Vector
+) -> Quaternion:
+    obj.rotation_euler, rotation_diff = get_rotation_aligned_with_direction(
+        obj.rotation_euler, axis, direction
+    )
     return rotation_diff
 
 
@@ -116,44 +144,99 @@ def get_average_object_rotation_euler(objs: list[bpy.types.Object]) -> Vector:
     return average_rotation / len(objs)
 
 
+def group_objects_by_data(
+    objs: list[bpy.types.Object],
+) -> dict[bpy.types.ID, list[bpy.types.Object]]:
+    """Returns the objects grouped by the data block they use, keeping their order"""
+    groups = {}
+    for obj in objs:
+        groups.setdefault(obj.data, []).append(obj)
+    return groups
+
+
+def get_other_data_users(
+    groups: dict[bpy.types.ID, list[bpy.types.Object]],
+) -> dict[bpy.types.ID, list[bpy.types.Object]]:
+    """Returns the objects using the data blocks that are not part of their group"""
+    shared_data = [data for data, users in groups.items() if data.users > len(users)]
+    if not shared_data:
+        return {}
+
+    user_map = bpy.data.user_map(subset=shared_data, value_types={"OBJECT"})
+    return {
+        data: [u for u in users if u.data == data and u not in groups[data]]
+        for data, users in user_map.items()
+    }
+
+
+def matrices_close(
+    matrix_a: Matrix, matrix_b: Matrix, tolerance: float = 0.00001
+) -> bool:
+    return all(
+        abs(value_a - value_b) <= tolerance
+        for row_a, row_b in zip(matrix_a, matrix_b)
+        for value_a, value_b in zip(row_a, row_b)
+    )
+
+
+def set_object_transforms(
+    objs: list[bpy.types.Object],
+    locations: Optional[list[Vector]] = None,
+    rotations: Optional[list[Euler]] = None,
+    compensate: bool = True,
+) -> list[bpy.types.Object]:
+    """Set location and rotation per object and compensate every mesh data block once.
+    Objects sharing data can only share one pivot, the first object of each data block sets it
+    and all other users of the data are moved to stay in place.
+    Returns the objects that could not get their own pivot because of that"""
+    overruled = []
+    with MeshSelectionModeState() as mode_state:
+        if compensate:
+            mode_state.set("OBJECT")
+        groups = group_objects_by_data(objs)
+        other_users = get_other_data_users(groups) if compensate else {}
+        targets = {
+            obj: (
+                locations[i] if locations else None,
+                rotations[i] if rotations else None,
+            )
+            for i, obj in enumerate(objs)
+        }
+
+        for data, users in groups.items():
+            old_bases = [obj.matrix_basis.copy() for obj in users]
+            for obj in users:
+                location, rotation = targets[obj]
+                if location is not None:
+                    obj.location = location
+                if rotation is not None:
+                    obj.rotation_euler = rotation
+            if not compensate:
+                continue
+
+            compensation = users[0].matrix_basis.inverted() @ old_bases[0]
+            data.transform(compensation, shape_keys=True)
+            data.update()
+
+            compensation_inverted = compensation.inverted()
+            for obj, old_basis in zip(users[1:], old_bases[1:]):
+                if not matrices_close(
+                    obj.matrix_basis.inverted() @ old_basis, compensation
+                ):
+                    obj.matrix_basis = old_basis @ compensation_inverted
+                    overruled.append(obj)
+            for obj in other_users.get(data, []):
+                obj.matrix_basis = obj.matrix_basis @ compensation_inverted
+    return overruled
+
+
 def set_object_location(
     obj: bpy.types.Object, location: Vector, compensate: bool = True
 ):
-    selection_mode = get_mesh_selection_mode(bpy.context)
-    if compensate:
-        set_mesh_selection_mode("OBJECT")
-        location_offset = location - obj.location
-        bm = bmesh.new()
-        bm.from_mesh(obj.data)
-        bm.verts.ensure_lookup_table()
-        for vert in bm.verts:
-            coords = obj.matrix_world @ vert.co.copy()
-            coords -= location_offset
-            vert.co = obj.matrix_world.inverted() @ coords
-        bm.to_mesh(obj.data)
-        bm.free()
-    obj.location = location
-    set_mesh_selection_mode(selection_mode)
+    set_object_transforms([obj], locations=[location], compensate=compensate)
 
 
 def set_object_rotation_euler(
     obj: bpy.types.Object, rotation: Euler, compensate: bool = True
 ):
-    selection_mode = get_mesh_selection_mode(bpy.context)
-    if compensate:
-        set_mesh_selection_mode("OBJECT")
-        rotation_quat = rotation.to_quaternion()
-        rotation_offset = rotation_quat.rotation_difference(
-            obj.rotation_euler.to_quaternion()
-        )
-        bm = bmesh.new()
-        bm.from_mesh(obj.data)
-        bm.verts.ensure_lookup_table()
-        for vert in bm.verts:
-            coords = vert.co.copy()
-            coords.rotate(rotation_offset)
-            vert.co = coords
-        bm.to_mesh(obj.data)
-        bm.free()
-    obj.rotation_euler = rotation
-    set_mesh_selection_mode(selection_mode)
+    set_object_transforms([obj], rotations=[rotation], compensate=compensate)
@@ -1,21 +1,483 @@
+from typing import Optional, Sequence, Union
+
 import bpy
+import numpy as np
+from bpy.app.handlers import persistent
+from mathutils import Matrix, Vector
+from mathutils.bvhtree import BVHTree
+
+# children per node of the hierarchy over the object bounds
+BOUNDS_BRANCHING = 8
+# bounds of objects that can't be hit, e.g. hidden ones
+EMPTY_BOUNDS = np.array([[np.inf] * 3, [-np.inf] * 3])
+
+
+def get_slab_entries(
+    origins: np.ndarray, directions: np.ndarray, bounds: np.ndarray, distance: float
+) -> np.ndarray:
+    """Returns the distance at which each of the (n, 3) rays enters its (n, 2, 3) bounds,
+    infinite where the ray misses the bounds or enters them beyond the distance"""
+    bounds_min = bounds[:, 0]
+    bounds_max = bounds[:, 1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        inverse_directions = 1.0 / directions
+        near = (bounds_min - origins) * inverse_directions
+        far = (bounds_max - origins) * inverse_directions
+
+    # a ray parallel to a slab is inside of it for the whole length or never
+    parallel = ~np.isfinite(inverse_directions)
+    inside = (bounds_min <= origins) & (origins <= bounds_max)
+    near = np.where(parallel, np.where(inside, -np.inf, np.inf), near)
+    far = np.where(parallel, np.inf, far)
+
+    enter = np.maximum(np.minimum(near, far).max(axis=1), 0.0)
+    leave = np.maximum(near, far).min(axis=1)
+    # empty bounds have their min above their max
+    valid = (bounds_min <= bounds_max).all(axis=1)
+    return np.where(valid & (leave >= enter) & (enter <= distance), enter, np.inf)
+
+
+def get_morton_order(bounds: np.ndarray) -> np.ndarray:
+    """Returns the order of the bounds along a Morton curve through their centers, so neighbours end up close"""
+    if len(bounds) == 0:
+        return np.empty(0, dtype=np.int64)
+    with np.errstate(invalid="ignore"):
+        centers = bounds.mean(axis=1)
+    # empty bounds have no center, they go with the origin
+    centers = np.nan_to_num(centers, nan=0.0, posinf=0.0, neginf=0.0)
+    low = centers.min(axis=0)
+    extent = np.maximum(centers.max(axis=0) - low, 1e-9)
+    cells = ((centers - low) / extent * 1023).astype(np.uint64)
+
+    # spread the 10 bits of every axis so they can be interleaved
+    cells = (cells | (cells << np.uint64(16))) & np.uint64(0x030000FF)
+    cells = (cells | (cells << np.uint64(8))) & np.uint64(0x0300F00F)
+    cells = (cells | (cells << np.uint64(4))) & np.uint64(0x030C30C3)
+    cells = (cells | (cells << np.uint64(2))) & np.uint64(0x09249249)
+    codes = cells[:, 0] | (cells[:, 1] << np.uint64(1)) | (cells[:, 2] << np.uint64(2))
+    return np.argsort(codes, kind="stable")
+
+
+def get_bounds_levels(leaf_bounds: np.ndarray) -> list[np.ndarray]:
+    """Returns the bounds of every level of the hierarchy, starting with the leaves.
+    Each node above encloses BOUNDS_BRANCHING consecutive nodes of the level below"""
+    levels = [leaf_bounds]
+    while len(levels[-1]) > BOUNDS_BRANCHING:
+        below = levels[-1]
+        starts = np.arange(0, len(below), BOUNDS_BRANCHING)
+        levels.append(
+            np.stack(
+                (
+                    np.minimum.reduceat(below[:, 0], starts, axis=0),
+                    np.maximum.reduceat(below[:, 1], starts, axis=0),
+                ),
+                axis=1,
+            )
+        )
+    return levels
+
+
+def query_bounds_levels(
+    levels: list[np.ndarray],
+    origins: np.ndarray,
+    directions: np.ndarray,
+    distance: float,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Returns the ray ids, leaf ids and entry distances of all pairs of rays and leaf bounds they hit.
+    The hierarchy is walked from the top for all rays at once, only descending into the nodes that were hit
+    """
+    top_count = len(levels[-1])
+    ray_ids = np.repeat(np.arange(len(origins)), top_count)
+    node_ids = np.tile(np.arange(top_count), len(origins))
+    children = np.arange(BOUNDS_BRANCHING)
+    for depth in range(len(levels) - 1, -1, -1):
+        enters = get_slab_entries(
+            origins[ray_ids], directions[ray_ids], levels[depth][node_ids], distance
+        )
+        hit = np.isfinite(enters)
+        ray_ids, node_ids, enters = ray_ids[hit], node_ids[hit], enters[hit]
+        if depth == 0:
+            break
+        ray_ids = np.repeat(ray_ids, BOUNDS_BRANCHING)
+        node_ids = (node_ids[:, np.newaxis] * BOUNDS_BRANCHING + children).ravel()
+        valid = node_ids < len(levels[depth - 1])
+        ray_ids, node_ids = ray_ids[valid], node_ids[valid]
+    return ray_ids, node_ids, enters
+
+
+def get_world_bounds_array(
+    matrices: np.ndarray, local_corners: np.ndarray
+) -> np.ndarray:
+    """Returns the (n, 2, 3) world space bounds of the (n, 8, 3) local bounding box corners moved by the (n, 4, 4) matrices"""
+    corners = (
+        np.einsum("nij,nkj->nki", matrices[:, :3, :3], local_corners)
+        + matrices[:, np.newaxis, :3, 3]
+    )
+    return np.stack((corners.min(axis=1), corners.max(axis=1)), axis=1)
+
+
+def get_world_bounds(matrix: Matrix, bound_box) -> np.ndarray:
+    """Returns the (2, 3) world space bounds of one object"""
+    return get_world_bounds_array(
+        np.array(matrix, dtype=np.float64).reshape(1, 4, 4),
+        np.array(bound_box, dtype=np.float64).reshape(1, 8, 3),
+    )[0]
+
+
+class RaycastScene:
+    """Casts rays against the evaluated mesh objects of a depsgraph.
+    A hierarchy over the world space bounding boxes picks the objects a ray can hit, only those get tested.
+    Every object gets a BVH tree in its local space on its first hit, which is kept until its geometry changes.
+    Changed objects only update their own bounds, the hierarchy is refit instead of rebuilt.
+    A frozen scene keeps its trees and bounds through all changes, e.g. while a modal operator moves the objects it ignores
+    """
+
+    def __init__(self):
+        self.depsgraph: Optional[bpy.types.Depsgraph] = None
+        self.frozen = False
+        self._trees: dict[str, BVHTree] = {}
+        self._objects: list[bpy.types.Object] = []
+        self._matrices: list[Matrix] = []
+        self._matrices_inverted: list[Matrix] = []
+        self._bounds: Optional[np.ndarray] = None
+        self._rows: dict[str, int] = {}
+        self._instance_names: set[str] = set()
+        self._order: Optional[np.ndarray] = None
+        self._levels: Optional[list[np.ndarray]] = None
+
+    def clear(self):
+        """Drop all trees and bounds"""
+        self._trees.clear()
+        self.invalidate_bounds()
+
+    def invalidate_bounds(self):
+        """Rebuild the object list and bounds on the next cast, e.g. after objects were added"""
+        self._objects = []
+        self._matrices = []
+        self._matrices_inverted = []
+        self._bounds = None
+        self._rows = {}
+        self._instance_names = set()
+        self._order = None
+        self._levels = None
+
+    def invalidate_object(self, obj: bpy.types.ID):
+        """Rebuild the tree of the object on the next hit"""
+        self._trees.pop(obj.name_full, None)
+
+    def update_object(self, obj: bpy.types.Object) -> bool:
+        """Update the matrix and bounds of the evaluated object, e.g. after it moved.
+        Returns False if that isn't enough and the bounds need a rebuild"""
+        if self._bounds is None:
+            return True
+        name = obj.original.name_full
+        if name in self._instance_names:
+            return False
+        row = self._rows.get(name)
+        if row is None:
+            # a mesh object that isn't known yet, or one that stopped being a mesh
+            return obj.type != "MESH"
+
+        matrix = obj.matrix_world.copy()
+        self._matrices[row] = matrix
+        self._matrices_inverted[row] = matrix.inverted_safe()
+        if obj.original.visible_get():
+            self._bounds[row] = get_world_bounds(matrix, obj.bound_box)
+        else:
+            self._bounds[row] = EMPTY_BOUNDS
+        self._levels = None
+        return True
+
+    def freeze(self):
+        """Keep the trees and bounds until thaw is called"""
+        self.frozen = True
+
+    def thaw(self, changed_objects: Sequence[bpy.types.Object] = ()):
+        """Follow scene changes again, rebuilding the bounds and the trees of the changed objects"""
+        self.frozen = False
+        self.invalidate_bounds()
+        for obj in changed_objects:
+            self.invalidate_object(obj)
+
+    def update(self, depsgraph: bpy.types.Depsgraph):
+        """Use the depsgraph and rebuild the bounds of all mesh objects once they were invalidated, e.g. by added or removed objects"""
+        if self.frozen:
+            return
+        if depsgraph != self.depsgraph:
+            self.clear()
+            self.depsgraph = depsgraph
+        if self._bounds is not None:
+            if self._levels is None:
+                self._levels = get_bounds_levels(self._bounds[self._order])
+            return
+
+        self.invalidate_bounds()
+        matrices = []
+        local_bounds = []
+        for instance in depsgraph.object_instances:
+            obj = instance.instance_object if instance.is_instance else instance.object
+            if obj is None or obj.type != "MESH":
+                continue
+            # instances of plain geometry have no object of their own to build a tree from
+            if instance.is_instance and instance.object.data != obj.data:
+                continue
+            if instance.is_instance:
+                self._instance_names.add(obj.original.name_full)
+                if instance.parent is not None:
+                    self._instance_names.add(instance.parent.original.name_full)
+            else:
+                self._rows[obj.original.name_full] = len(self._objects)
+            matrix = instance.matrix_world.copy()
+            self._objects.append(obj.original)
+            self._matrices.append(matrix)
+            self._matrices_inverted.append(matrix.inverted_safe())
+            matrices.append(matrix)
+            local_bounds.append(obj.bound_box)
+
+        self._bounds = get_world_bounds_array(
+            np.array(matrices, dtype=np.float64).reshape(-1, 4, 4),
+            np.array(local_bounds, dtype=np.float64).reshape(-1, 8, 3),
+        )
+        self._order = get_morton_order(self._bounds)
+        self._levels = get_bounds_levels(self._bounds[self._order])
+
+    def get_tree(self, obj: bpy.types.Object) -> Optional[BVHTree]:
+        """Returns the tree of the evaluated object in its local space"""
+        tree = self._trees.get(obj.name_full)
+        if tree is None:
+            tree = BVHTree.FromObject(obj.evaluated_get(self.depsgraph), self.depsgraph)
+            self._trees[obj.name_full] = tree
+        return tree
+
+    def get_candidates(
+        self, origins: np.ndarray, directions: np.ndarray, distance: float
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Returns the ray ids, object ids and entry distances of all pairs of rays and object bounds they hit"""
+        if self._levels is None:
+            self._levels = get_bounds_levels(self._bounds[self._order])
+        ray_ids, leaf_ids, enters = query_bounds_levels(
+            self._levels, origins, directions, distance
+        )
+        return ray_ids, self._order[leaf_ids], enters
+
+    def ray_cast_many(
+        self,
+        origins: Union[np.ndarray, Sequence[Sequence[float]]],
+        directions: Union[np.ndarray, Sequence[Sequence[float]]],
+        distance: float = 1.0e10,
+        ignore: Optional[Sequence[bpy.types.Object]] = None,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Casts many world space rays at once, passing through the ignored objects.
+        Returns arrays of whether each ray hit, the locations, normals, face indices and objects, None where nothing was hit
+        """
+        origins = np.asarray(origins, dtype=np.float64).reshape(-1, 3)
+        directions = np.asarray(directions, dtype=np.float64).reshape(-1, 3)
+        lengths = np.linalg.norm(directions, axis=1, keepdims=True)
+        directions = np.divide(
+            directions, lengths, out=np.zeros_like(directions), where=lengths > 0
+        )
+
+        ray_count = len(origins)
+        locations = np.zeros((ray_count, 3))
+        normals = np.zeros((ray_count, 3))
+        face_indices = np.full(ray_count, -1, dtype=np.int64)
+        object_ids = np.full(ray_count, -1, dtype=np.int64)
+        best_distances = np.full(ray_count, float(distance))
+
+        object_count = len(self._objects)
+        if ray_count == 0 or object_count == 0:
+            pair_ray_ids = pair_object_ids = pair_enters = np.empty(0, dtype=np.int64)
+        else:
+            pair_ray_ids, pair_object_ids, pair_enters = self.get_candidates(
+                origins, directions, distance
+            )
+        if ignore and len(pair_object_ids) > 0:
+            # only the objects the rays can hit are checked against the ignored ones
+            ignored_names = {obj.name_full for obj in ignore}
+            candidate_ids, pair_candidates = np.unique(
+                pair_object_ids, return_inverse=True
+            )
+            ignored = np.array(
+                [
+                    self._objects[i].name_full in ignored_names
+                    for i in candidate_ids.tolist()
+                ],
+                dtype=bool,
+            )
+            kept = ~ignored[pair_candidates]
+            pair_ray_ids = pair_ray_ids[kept]
+            pair_object_ids = pair_object_ids[kept]
+            pair_enters = pair_enters[kept]
+
+        # visit the objects in the order the rays first enter them, so closer hits cut off the later tests
+        pair_order = np.argsort(pair_enters, kind="stable")
+        pair_ray_ids = pair_ray_ids[pair_order]
+        pair_object_ids = pair_object_ids[pair_order]
+        pair_enters = pair_enters[pair_order]
+        candidates, first_pairs = np.unique(pair_object_ids, return_index=True)
+        object_pairs = np.argsort(pair_object_ids, kind="stable")
+        object_starts = np.searchsorted(pair_object_ids[object_pairs], candidates)
+        object_ends = np.append(object_starts[1:], len(object_pairs))
+
+        for candidate in np.argsort(first_pairs).tolist():
+            i = int(candidates[candidate])
+            pairs = object_pairs[object_starts[candidate] : object_ends[candidate]]
+            ray_ids = pair_ray_ids[pairs]
+            ray_ids = ray_ids[pair_enters[pairs] < best_distances[ray_ids]]
+            if len(ray_ids) == 0:
+                continue
+            tree = self.get_tree(self._objects[i])
+            if tree is None:
+                continue
+
+            matrix = self._matrices[i]
+            matrix_inverted = np.array(self._matrices_inverted[i])
+            local_origins = (
+                origins[ray_ids] @ matrix_inverted[:3, :3].T + matrix_inverted[:3, 3]
+            )
+            local_directions = directions[ray_ids] @ matrix_inverted[:3, :3].T
+            normal_matrix = self._matrices_inverted[i].to_3x3().transposed()
+
+            for ray_id, local_origin, local_direction in zip(
+                ray_ids.tolist(), local_origins.tolist(), local_directions.tolist()
+            ):
+                location, normal, index, _ = tree.ray_cast(
+                    local_origin, local_direction
+                )
+                if location is None:
+                    continue
+                location = matrix @ location
+                hit_distance = (location - Vector(origins[ray_id])).length
+                if hit_distance >= best_distances[ray_id]:
+                    continue
+                best_distances[ray_id] = hit_distance
+                locations[ray_id] = location
+                normals[ray_id] = (normal_matrix @ normal).normalized()
+                face_indices[ray_id] = index
+                object_ids[ray_id] = i
+
+        hits = object_ids >= 0
+        objects = np.empty(object_count + 1, dtype=object)
+        objects[:object_count] = self._objects
+        objects[object_count] = None
+        return hits, locations, normals, face_indices, objects[object_ids]
+
+    def ray_cast(
+        self,
+        origin: Vector,
+        direction: Vector,
+        distance: float = 1.0e10,
+        ignore: Optional[Sequence[bpy.types.Object]] = None,
+    ) -> tuple[bool, Vector, Vector, int, Optional[bpy.types.Object]]:
+        """Returns like Scene.ray_cast whether something was hit, the location, normal, face index and object"""
+        hits, locations, normals, face_indices, objects = self.ray_cast_many(
+            [origin], [direction], distance, ignore
+        )
+        return (
+            bool(hits[0]),
+            Vector(locations[0]),
+            Vector(normals[0]),
+            int(face_indices[0]),
+            objects[0],
+        )
+
+
+RAYCAST_SCENE = RaycastScene()
+
+
+def get_raycast_scene(context: bpy.types.Context) -> RaycastScene:
+    """Returns the shared raycast scene, up to date with the evaluated depsgraph of the context"""
+    RAYCAST_SCENE.update(context.evaluated_depsgraph_get())
+    return RAYCAST_SCENE
+
+
+def get_view_rays(
+    context: bpy.types.Context, coords: Sequence[Sequence[float]]
+) -> tuple[np.ndarray, np.ndarray]:
+    """Returns the world space origins and directions of the view rays through the region coordinates"""
+    from bpy_extras import view3d_utils
+
+    region = context.region
+    rv3d = context.region_data
+    origins = [view3d_utils.region_2d_to_origin_3d(region, rv3d, c) for c in coords]
+    directions = [view3d_utils.region_2d_to_vector_3d(region, rv3d, c) for c in coords]
+    return np.array(origins).reshape(-1, 3), np.array(directions).reshape(-1, 3)
 
 
 def raycast(
-    context, coords
+    context, coords, ignore: Optional[Sequence[bpy.types.Object]] = None
 ) -> tuple[bool, list[float], list[float], int, bpy.types.Object]:
     """Casts a ray at the mouse position and returns raycast_result, location, normal, face_index, obj_target"""
     from bpy_extras import view3d_utils
 
-    scene = context.scene
     region = context.region
     rv3d = context.region_data
-    depsgraph = bpy.context.evaluated_depsgraph_get()
 
     view_vector = view3d_utils.region_2d_to_vector_3d(region, rv3d, coords)
     ray_origin = view3d_utils.region_2d_to_origin_3d(region, rv3d, coords)
 
-    raycast_result, location, normal, polygon_index, obj_target, _ = scene.ray_cast(
-        depsgraph, ray_origin, view_vector
-    )
-    return raycast_result, location, normal, polygon_index, obj_target
+    return get_raycast_scene(context).ray_cast(ray_origin, view_vector, ignore=ignore)
+
+
+def raycast_many(
+    context: bpy.types.Context, coords: Sequence[Sequence[float]]
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Casts view rays through many region coordinates at once.
+    Returns arrays of raycast_result, location, normal, face_index and obj_target"""
+    origins, directions = get_view_rays(context, coords)
+    return get_raycast_scene(context).ray_cast_many(origins, directions)
+
+
+@persistent
+def on_depsgraph_update(scene: bpy.types.Scene, depsgraph: bpy.types.Depsgraph):
+    if RAYCAST_SCENE.frozen:
+        return
+    for update in depsgraph.updates:
+        if isinstance(update.id, bpy.types.Collection):
+            RAYCAST_SCENE.invalidate_bounds()
+        if not isinstance(update.id, bpy.types.Object):
+            continue
+        if update.is_updated_geometry:
+            RAYCAST_SCENE.invalidate_object(update.id.original)
+        # only the bounds of the changed object are updated, unless it is part of instancing
+        if (
+            update.is_updated_geometry or update.is_updated_transform
+        ) and not RAYCAST_SCENE.update_object(update.id):
+            RAYCAST_SCENE.invalidate_bounds()
+
+
+@persistent
+def on_file_change(*_):
+    RAYCAST_SCENE.frozen = False
+    RAYCAST_SCENE.clear()
+    RAYCAST_SCENE.depsgraph = None
+
+
+HANDLERS = (
+    (bpy.app.handlers.depsgraph_update_post, on_depsgraph_update),
+    (bpy.app.handlers.undo_post, on_file_change),
+    (bpy.app.handlers.redo_post, on_file_change),
+    (bpy.app.handlers.load_post, on_file_change),
+)
+
+
+def remove_handlers():
+    """Remove the handlers, including the ones of an earlier load of this module"""
+    for handlers, handler in HANDLERS:
+        for existing in list(handlers):
+            if (
+                getattr(existing, "__module__", None) == handler.__module__
+                and getattr(existing, "__name__", None) == handler.__name__
+            ):
+                handlers.remove(existing)
+
+
+def register():
+    remove_handlers()
+    for handlers, handler in HANDLERS:
+        handlers.append(handler)
+
+
+def unregister():
+    remove_handlers()
+    RAYCAST_SCENE.clear()
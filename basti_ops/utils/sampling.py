@@ -0,0 +1,128 @@
+from itertools import product
+from typing import Optional
+
+import bpy
+import numpy as np
+
+from .mesh import get_mesh_vertex_vectors
+from .raycast import get_raycast_scene, get_view_rays
+
+# cells around a cell of the hash grid, including itself
+NEIGHBOUR_CELLS = tuple(product((-1, 0, 1), repeat=3))
+
+
+def get_poisson_disk_mask(
+    points: np.ndarray, min_distance: float, max_count: Optional[int] = None
+) -> np.ndarray:
+    """Returns a mask of the points kept by going through them in order and dropping every point
+    closer than the min distance to one kept before, until max count points are kept.
+    Kept points are stored in a hash grid with cells as big as the min distance,
+    so every point is only checked against the points in the cells around it"""
+    mask = np.zeros(len(points), dtype=bool)
+    if max_count is None:
+        max_count = len(points)
+    if min_distance <= 0.0:
+        mask[:max_count] = True
+        return mask
+
+    cells = np.floor(points / min_distance).astype(np.int64).tolist()
+    squared_distance = min_distance * min_distance
+    grid: dict[tuple[int, int, int], list[list[float]]] = {}
+    kept = 0
+    for i, (cell, point) in enumerate(zip(cells, points.tolist())):
+        if kept >= max_count:
+            break
+        x, y, z = cell
+        too_close = False
+        for dx, dy, dz in NEIGHBOUR_CELLS:
+            for other in grid.get((x + dx, y + dy, z + dz), ()):
+                if (
+                    (point[0] - other[0]) ** 2
+                    + (point[1] - other[1]) ** 2
+                    + (point[2] - other[2]) ** 2
+                ) < squared_distance:
+                    too_close = True
+                    break
+            if too_close:
+                break
+        if too_close:
+            continue
+        grid.setdefault((x, y, z), []).append(point)
+        mask[i] = True
+        kept += 1
+    return mask
+
+
+def get_world_triangles(
+    objs: list[bpy.types.Object], depsgraph: bpy.types.Depsgraph
+) -> np.ndarray:
+    """Returns the (n, 3, 3) world space corners of the triangles of the evaluated objects"""
+    triangles = [np.empty((0, 3, 3))]
+    for obj in objs:
+        obj_evaluated = obj.evaluated_get(depsgraph)
+        mesh = obj_evaluated.to_mesh()
+        mesh.calc_loop_triangles()
+        triangle_verts = np.empty(len(mesh.loop_triangles) * 3, dtype=np.int32)
+        mesh.loop_triangles.foreach_get("vertices", triangle_verts)
+        coords = get_mesh_vertex_vectors(mesh).astype(np.float64)
+        obj_evaluated.to_mesh_clear()
+
+        matrix = np.array(obj.matrix_world)
+        coords = coords @ matrix[:3, :3].T + matrix[:3, 3]
+        obj_triangles = coords[triangle_verts].reshape(-1, 3, 3)
+        # a negative scale turns the winding and so the normals around
+        if np.linalg.det(matrix[:3, :3]) < 0.0:
+            obj_triangles = obj_triangles[:, ::-1]
+        triangles.append(obj_triangles)
+    return np.concatenate(triangles)
+
+
+def get_surface_samples(
+    objs: list[bpy.types.Object],
+    depsgraph: bpy.types.Depsgraph,
+    count: int,
+    seed: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Returns (count, 3) world space points spread uniformly over the surfaces of the objects and their normals"""
+    triangles = get_world_triangles(objs, depsgraph)
+    crossed = np.cross(
+        triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0]
+    )
+    areas = np.linalg.norm(crossed, axis=1)
+    if len(triangles) == 0 or areas.sum() <= 0.0:
+        return np.empty((0, 3)), np.empty((0, 3))
+
+    rng = np.random.default_rng(seed % 2**32)
+    triangle_ids = rng.choice(len(triangles), size=count, p=areas / areas.sum())
+    # folding the unit square onto the triangle keeps the points uniform
+    u, v = rng.random((2, count))
+    outside = u + v > 1.0
+    u[outside] = 1.0 - u[outside]
+    v[outside] = 1.0 - v[outside]
+
+    corners = triangles[triangle_ids]
+    points = (
+        corners[:, 0]
+        + u[:, np.newaxis] * (corners[:, 1] - corners[:, 0])
+        + v[:, np.newaxis] * (corners[:, 2] - corners[:, 0])
+    )
+    normals = crossed[triangle_ids] / areas[triangle_ids, np.newaxis]
+    return points, normals
+
+
+def get_view_samples(
+    context: bpy.types.Context,
+    count: int,
+    seed: int,
+    ignore: Optional[list[bpy.types.Object]] = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Returns the world space locations and normals where rays through random points of the view hit a surface.
+    The rays pass through the ignored objects"""
+    region = context.region
+    rng = np.random.default_rng(seed % 2**32)
+    coords = rng.random((count, 2)) * (region.width, region.height)
+    origins, directions = get_view_rays(context, coords.tolist())
+    hits, locations, normals, _, _ = get_raycast_scene(context).ray_cast_many(
+        origins, directions, ignore=ignore
+    )
+    return locations[hits], normals[hits]
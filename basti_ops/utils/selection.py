@@ -1,8 +1,15 @@
-from typing import Optional, Literal, Union
+from typing import Optional, Literal, Union, Sequence
 
 import bpy
 import bmesh
+import numpy as np
 
+from .topology import (
+    get_edge_vertex_array,
+    label_islands,
+    get_island_mask,
+)
+from .edit_mesh import EditMeshSession, edit_mesh_session
 
 EditMeshSelectionModes: list[Literal["VERT", "EDGE", "FACE"]] = ["VERT", "EDGE", "FACE"]
 
@@ -29,37 +36,75 @@ def get_mesh_selection_mode(
     return None
 
 
+def set_object_mode(mode: str):
+    """Switch the object interaction mode, unless it is already active"""
+    obj = bpy.context.active_object
+    if obj is not None and obj.mode == mode:
+        return
+    bpy.ops.object.mode_set(mode=mode)
+
+
 def set_mesh_selection_mode(
     selection_mode: Union[str, tuple[bool, bool, bool], None],
     curve: Optional[bool] = False,
 ):
     if selection_mode == "OBJECT":
-        bpy.ops.object.mode_set(mode="OBJECT")
+        set_object_mode("OBJECT")
         return
 
     if curve:
-        bpy.ops.object.mode_set(mode="EDIT")
+        set_object_mode("EDIT")
         return
 
     if selection_mode == "SCULPT":
-        bpy.ops.object.mode_set(mode="SCULPT")
+        set_object_mode("SCULPT")
         return
 
     if isinstance(selection_mode, tuple):
-        bpy.ops.object.mode_set(mode="EDIT")
-        for i in range(0, 3):
-            bpy.ops.mesh.select_mode(
-                use_extend=True,
-                type=EditMeshSelectionModes[i],
-                action="ENABLE" if selection_mode[i] is True else "DISABLE",
-            )
+        set_object_mode("EDIT")
+        bpy.context.tool_settings.mesh_select_mode = selection_mode
         return
 
     if selection_mode in EditMeshSelectionModes:
-        bpy.ops.object.mode_set(mode="EDIT")
+        set_object_mode("EDIT")
         bpy.ops.mesh.select_mode(type=selection_mode)
 
 
+class MeshSelectionModeState:
+    """Switches between object and edit mode while skipping transitions to the mode that is already active.
+    Every switch between edit and object mode copies the whole mesh, so operators should only switch when needed.
+    Used as a context manager it restores the initial mode on exit"""
+
+    def __init__(self, context: Optional[bpy.types.Context] = None):
+        self.context = context or bpy.context
+        self.initial_mode = get_mesh_selection_mode(self.context)
+
+    @property
+    def current_mode(self) -> Union[None, str, tuple[bool, bool, bool]]:
+        return get_mesh_selection_mode(self.context)
+
+    def set(
+        self,
+        selection_mode: Union[str, tuple[bool, bool, bool], None],
+        curve: Optional[bool] = False,
+    ):
+        """Switch to the mode if it isn't the current one"""
+        if selection_mode is None or selection_mode == self.current_mode:
+            return
+        set_mesh_selection_mode(selection_mode, curve)
+
+    def restore(self):
+        """Switch back to the mode that was active when the state was created"""
+        self.set(self.initial_mode)
+
+    def __enter__(self) -> "MeshSelectionModeState":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.restore()
+        return False
+
+
 def get_continuous_edge_selection(
     edges_selected: list[bmesh.types.BMEdge], start_index: int = 0
 ) -> tuple[list[bmesh.types.BMEdge], list[bmesh.types.BMEdge]]:
@@ -84,48 +129,112 @@ def get_continuous_edge_selection(
     return edges_connected, edges_selected
 
 
+def sync_edit_mesh(obj: bpy.types.Object, session: Optional[EditMeshSession] = None):
+    """Write the edit mesh to the mesh data, only once per change if a session is given"""
+    if session is not None:
+        session.sync()
+    else:
+        obj.update_from_editmode()
+
+
+def get_element_group(
+    mesh: bpy.types.Mesh, element_type: Literal["VERT", "EDGE", "FACE"]
+) -> Union[bpy.types.MeshVertices, bpy.types.MeshEdges, bpy.types.MeshPolygons]:
+    """Returns the mesh collection holding elements of the type"""
+    if element_type == "VERT":
+        return mesh.vertices
+    elif element_type == "EDGE":
+        return mesh.edges
+    elif element_type == "FACE":
+        return mesh.polygons
+    raise RuntimeError("Element group not found")
+
+
+def get_selection_masks(
+    obj: bpy.types.Object,
+    element_types: Sequence[Literal["VERT", "EDGE", "FACE"]] = EditMeshSelectionModes,
+    session: Optional[EditMeshSession] = None,
+) -> dict[str, np.ndarray]:
+    """Returns a snapshot of the select flags as boolean arrays per element type.
+    The edit mesh is only synced once, no matter how many element types are read"""
+    sync_edit_mesh(obj, session)
+    masks = {}
+    for element_type in element_types:
+        element_group = get_element_group(obj.data, element_type)
+        mask = np.zeros(len(element_group), dtype=bool)
+        element_group.foreach_get("select", mask)
+        masks[element_type] = mask
+    return masks
+
+
+def get_selection_mask(
+    obj: bpy.types.Object,
+    element_type: Literal["VERT", "EDGE", "FACE"],
+    session: Optional[EditMeshSession] = None,
+) -> np.ndarray:
+    """Returns the select flags of all elements of the type as a boolean array"""
+    return get_selection_masks(obj, (element_type,), session)[element_type]
+
+
+def get_selected_ids(
+    obj: bpy.types.Object,
+    element_type: Literal["VERT", "EDGE", "FACE"],
+    none_is_all: bool = False,
+    session: Optional[EditMeshSession] = None,
+) -> np.ndarray:
+    """Returns the indices of the selected elements of the type as an array"""
+    mask = get_selection_mask(obj, element_type, session)
+    if none_is_all and not mask.any():
+        return np.arange(len(mask))
+    return np.flatnonzero(mask)
+
+
 def get_selected(
     obj: bpy.types.Object,
     element_type: Literal["VERT", "EDGE", "FACE"],
     none_is_all: bool = False,
     get_index: bool = False,
+    session: Optional[EditMeshSession] = None,
 ):
-    obj.update_from_editmode()
-    if element_type == "VERT":
-        element_group = obj.data.vertices
-    elif element_type == "EDGE":
-        element_group = obj.data.edges
-    elif element_type == "FACE":
-        element_group = obj.data.polygons
-    else:
-        raise RuntimeError("Element group not found")
-
-    selection = [e for e in element_group if e.select]
-    if none_is_all and len(selection) == 0:
-        selection = element_group
+    mask = get_selection_mask(obj, element_type, session)
+    selection_ids = np.flatnonzero(mask).tolist()
+    element_group = get_element_group(obj.data, element_type)
+    if none_is_all and len(selection_ids) == 0:
+        return list(range(len(element_group))) if get_index else element_group
 
-    return [e.index for e in selection] if get_index else selection
+    if get_index:
+        return selection_ids
+    return [element_group[i] for i in selection_ids]
 
 
 def get_selected_vertices(
-    obj: bpy.types.Object, none_is_all: bool = False, get_index: bool = False
+    obj: bpy.types.Object,
+    none_is_all: bool = False,
+    get_index: bool = False,
+    session: Optional[EditMeshSession] = None,
 ) -> list[bpy.types.MeshVertex]:
     """Returns a list of selected vertices in the mesh"""
-    return get_selected(obj, "VERT", none_is_all, get_index)
+    return get_selected(obj, "VERT", none_is_all, get_index, session)
 
 
 def get_selected_edges(
-    obj: bpy.types.Object, none_is_all: bool = False, get_index: bool = False
+    obj: bpy.types.Object,
+    none_is_all: bool = False,
+    get_index: bool = False,
+    session: Optional[EditMeshSession] = None,
 ) -> list[bpy.types.MeshEdge]:
     """Returns a list of selected edges in the mesh"""
-    return get_selected(obj, "EDGE", none_is_all, get_index)
+    return get_selected(obj, "EDGE", none_is_all, get_index, session)
 
 
 def get_selected_polygons(
-    obj: bpy.types.Object, none_is_all: bool = False, get_index: bool = False
+    obj: bpy.types.Object,
+    none_is_all: bool = False,
+    get_index: bool = False,
+    session: Optional[EditMeshSession] = None,
 ) -> list[bpy.types.MeshPolygon]:
     """Returns a list of selected polygons in the mesh"""
-    return get_selected(obj, "FACE", none_is_all, get_index)
+    return get_selected(obj, "FACE", none_is_all, get_index, session)
 
 
 def add_vertices_from_polygons(
@@ -142,6 +251,40 @@ def add_vertices_from_polygons(
     return verts_selected
 
 
+def get_bm_seed_verts(
+    bm: bmesh.types.BMesh,
+    seed_verts: Optional[
+        Union[list[bpy.types.MeshVertex], list[bmesh.types.BMVert], list[int]]
+    ] = None,
+) -> list[bmesh.types.BMVert]:
+    """Returns the seeds as BMVerts, or the selected ones or all if nothing is selected when no seeds are given"""
+    if seed_verts is None or len(seed_verts) == 0:
+        selected_verts = [v for v in bm.verts if v.select]
+        return selected_verts or list(bm.verts)
+    if isinstance(seed_verts[0], bmesh.types.BMVert):
+        return list(seed_verts)
+    bm.verts.ensure_lookup_table()
+    if isinstance(seed_verts[0], (int, np.integer)):
+        return [bm.verts[i] for i in seed_verts]
+    return [bm.verts[v.index] for v in seed_verts]
+
+
+def walk_linked_bm_verts(
+    seed_verts: list[bmesh.types.BMVert],
+) -> list[bmesh.types.BMVert]:
+    """Returns the seeds followed by all verts connected to them in order of discovery.
+    Only the linked verts and their edges are visited"""
+    found = list(dict.fromkeys(seed_verts))
+    visited = set(found)
+    for vert in found:
+        for edge in vert.link_edges:
+            other = edge.other_vert(vert)
+            if other not in visited:
+                visited.add(other)
+                found.append(other)
+    return found
+
+
 def get_linked_verts(
     obj: bpy.types.Object,
     bm: Optional[bmesh.types.BMesh] = None,
@@ -149,132 +292,169 @@ def get_linked_verts(
         Union[list[bpy.types.MeshVertex], list[bmesh.types.BMVert], list[int]]
     ] = None,
     get_index: Optional[bool] = False,
+    session: Optional[EditMeshSession] = None,
 ) -> Union[list[bpy.types.MeshVertex], list[bmesh.types.BMVert], list[int]]:
-    bm_temp = bmesh.from_edit_mesh(obj.data) if bm is None else bm
-    bm_temp.verts.ensure_lookup_table()
-    bm_temp.edges.ensure_lookup_table()
-
-    selected_vert_ids = get_selected_vertices(obj, get_index=True)
-
-    if seed_verts:
+    """Returns the seed vertices, or the selection if no seeds are given, and all vertices linked to them.
+    With a session its island labels are used, with only a BMesh its edges are walked,
+    so the edit mesh isn't written to the mesh data"""
+    if bm is not None and session is None:
+        linked_verts = walk_linked_bm_verts(get_bm_seed_verts(bm, seed_verts))
+        if get_index:
+            return [v.index for v in linked_verts]
+        return linked_verts
+
+    if seed_verts is not None and len(seed_verts) > 0:
+        sync_edit_mesh(obj, session)
         vert_ids = (
-            seed_verts
-            if isinstance(seed_verts[0], int)
-            else [v.index for v in seed_verts]
+            np.asarray(seed_verts)
+            if isinstance(seed_verts[0], (int, np.integer))
+            else np.array([v.index for v in seed_verts])
         )
     else:
-        vert_ids = (
-            selected_vert_ids
-            if len(selected_vert_ids) > 0
-            else [v.index for v in bm_temp.verts]
-        )
-
-    checked_edges = [
-        e
-        for v_id in vert_ids
-        for e in bm_temp.verts[v_id].link_edges
-        if all(v.index in vert_ids for v in e.verts)
-    ]
-    edges_to_check = [
-        e
-        for i in vert_ids
-        for e in bm_temp.verts[i].link_edges
-        if e.index not in checked_edges
-        and not all(v.index in vert_ids for v in e.verts)
-    ]
+        vert_ids = get_selected_ids(obj, "VERT", none_is_all=True, session=session)
 
-    while len(edges_to_check) > 0:
-        edge = edges_to_check.pop()
-        checked_edges.append(edge)
-        for vert in edge.verts:
-            if vert.index in vert_ids:
-                continue
-            vert_ids.append(vert.index)
-            edges_to_check.extend(
-                e
-                for e in bm_temp.verts[vert.index].link_edges
-                if e.index not in checked_edges
-                and not all(v.index in vert_ids for v in e.verts)
-            )
+    linked_vert_ids = get_island_vert_ids(obj, vert_ids, session=session).tolist()
 
     if get_index:
-        return_list = vert_ids
-    else:
-        return_list = (
-            [bm.verts[i] for i in vert_ids]
-            if bm is not None
-            else [obj.data.vertices[i] for i in vert_ids]
-        )
+        return linked_vert_ids
+    if bm is not None:
+        bm.verts.ensure_lookup_table()
+        return [bm.verts[i] for i in linked_vert_ids]
+    return [obj.data.vertices[i] for i in linked_vert_ids]
+
+
+def get_island_labels(
+    obj: bpy.types.Object, session: Optional[EditMeshSession] = None
+) -> np.ndarray:
+    """Returns an island id per vertex for the whole mesh"""
+    if session is not None:
+        return session.island_labels
+    obj.update_from_editmode()
+    return label_islands(get_edge_vertex_array(obj.data), len(obj.data.vertices))
 
-    if bm is None:
-        bm_temp.free()
 
-    return return_list
+def get_island_vert_ids(
+    obj: bpy.types.Object,
+    seed_ids: Union[np.ndarray, list[int]],
+    labels: Optional[np.ndarray] = None,
+    session: Optional[EditMeshSession] = None,
+) -> np.ndarray:
+    """Returns the ids of all vertices on islands touching the seeds.
+    Pass labels from get_island_labels or a session to label the islands only once"""
+    if labels is None:
+        labels = get_island_labels(obj, session)
+    return np.flatnonzero(get_island_mask(labels, seed_ids))
 
 
 def get_selected_bm_vertices(
-    bm: bmesh.types.BMesh, obj: bpy.types.Object
+    bm: bmesh.types.BMesh,
+    obj: bpy.types.Object,
+    session: Optional[EditMeshSession] = None,
 ) -> list[bmesh.types.BMVert]:
     """Returns a list of selected vertices in the mesh"""
-    bm.verts.ensure_lookup_table()
-    return [bm.verts[i] for i in get_selected_vertices(obj, get_index=True)]
+    if session is not None:
+        session.ensure_lookup_tables()
+    else:
+        bm.verts.ensure_lookup_table()
+    return [
+        bm.verts[i] for i in get_selected_vertices(obj, get_index=True, session=session)
+    ]
+
+
+def get_bm_element_group(
+    bm: bmesh.types.BMesh, element_type: Literal["VERT", "EDGE", "FACE"]
+) -> Union[bmesh.types.BMVertSeq, bmesh.types.BMEdgeSeq, bmesh.types.BMFaceSeq]:
+    """Returns the BMesh sequence holding elements of the type"""
+    if element_type == "VERT":
+        return bm.verts
+    elif element_type == "EDGE":
+        return bm.edges
+    elif element_type == "FACE":
+        return bm.faces
+    raise RuntimeError("Element group not found")
+
+
+def clear_bm_selection(session: EditMeshSession):
+    """Deselect all elements, only visiting the selected vertices and flushing the rest.
+    The selection is read from the mesh data while it matches the BMesh and from the BMesh otherwise,
+    so clearing never writes the whole edit mesh"""
+    bm = session.bm
+    if session.synced:
+        session.ensure_lookup_tables()
+        selected_verts = [
+            bm.verts[i]
+            for i in get_selected_ids(session.obj, "VERT", session=session).tolist()
+        ]
+    else:
+        selected_verts = [v for v in bm.verts if v.select]
+    for vert in selected_verts:
+        vert.select = False
+    bm.select_flush(False)
+    bm.select_history.clear()
+    session.tag_update()
+
+
+def set_selection_by_id(
+    session: EditMeshSession,
+    element_type: Literal["VERT", "EDGE", "FACE"],
+    indices: Union[np.ndarray, list[int]],
+    clear_selection: bool = True,
+    deselect: bool = False,
+):
+    """Write the selection of one element domain from an index array in one pass.
+    The selection is flushed to the other domains based on the current selection mode"""
+    if clear_selection and not deselect:
+        clear_bm_selection(session)
+
+    session.ensure_lookup_tables()
+    element_group = get_bm_element_group(session.bm, element_type)
+    for i in np.asarray(indices, dtype=np.int64).tolist():
+        element_group[i].select_set(not deselect)
+    session.bm.select_flush_mode()
+    session.tag_update()
 
 
 def select_by_id(
     obj: bpy.types.Object,
     selection_mode: Literal["VERT", "EDGE", "FACE"],
-    indices: list[int],
+    indices: Union[np.ndarray, list[int]],
     clear_selection: bool = True,
     deselect: bool = False,
+    session: Optional[EditMeshSession] = None,
 ):
     """Select or deselect elements by type and index in the mesh"""
-    if clear_selection and not deselect:
-        force_deselect_all(obj)
+    if obj.mode != "EDIT":
+        set_mesh_selection_mode("OBJECT")
+        obj.select_set(True)
     set_mesh_selection_mode(selection_mode)
-    bm = bmesh.from_edit_mesh(obj.data)
-
-    element_group = None
-    if selection_mode == "VERT":
-        element_group = bm.verts
-    if selection_mode == "EDGE":
-        element_group = bm.edges
-    if selection_mode == "FACE":
-        element_group = bm.faces
-
-    if not element_group:
-        raise RuntimeError("Element group not found")
 
-    element_group.ensure_lookup_table()
+    with edit_mesh_session(obj, session) as session:
+        set_selection_by_id(session, selection_mode, indices, clear_selection, deselect)
 
-    for i in indices:
-        element_group[i].select_set(not deselect)
-
-    bmesh.update_edit_mesh(obj.data)
-    bm.free()
 
+def force_deselect_all(
+    obj: bpy.types.Object, session: Optional[EditMeshSession] = None
+):
+    """Force deselect all elements, without switching modes"""
+    if obj.mode != "EDIT":
+        for element_type in EditMeshSelectionModes:
+            element_group = get_element_group(obj.data, element_type)
+            element_group.foreach_set(
+                "select", np.zeros(len(element_group), dtype=bool)
+            )
+        obj.data.update()
+        return
 
-def force_deselect_all(obj: bpy.types.Object):
-    """Force deselect all elements"""
-    set_mesh_selection_mode("OBJECT")
-    obj.select_set(True)
-    set_mesh_selection_mode((True, True, True))
-    bm = bmesh.from_edit_mesh(obj.data)
-
-    for group in [bm.verts, bm.edges, bm.faces]:
-        for element in group:
-            element.select_set(False)
-    bmesh.update_edit_mesh(obj.data)
-    bm.free()
-    # todo: active vert stays selected
+    with edit_mesh_session(obj, session) as session:
+        clear_bm_selection(session)
 
 
 def select_edges_between_vertices(obj: bpy.types.Object):
-    obj.update_from_editmode()
-    selected_verts = get_selected_vertices(obj, get_index=True)
-    edges_to_select = [
-        e.index for e in obj.data.edges if all(i in selected_verts for i in e.key)
-    ]
-    select_by_id(obj, "EDGE", edges_to_select)
+    vert_mask = get_selection_mask(obj, "VERT")
+    edge_verts = np.zeros(len(obj.data.edges) * 2, dtype=np.int32)
+    obj.data.edges.foreach_get("vertices", edge_verts)
+    edges_to_select = np.flatnonzero(vert_mask[edge_verts].reshape(-1, 2).all(axis=1))
+    select_by_id(obj, "EDGE", edges_to_select.tolist())
 
 
 def select_shared_edges_from_polygons(obj: bpy.types.Object):
@@ -301,10 +481,13 @@ def select_shared_edges_from_polygons(obj: bpy.types.Object):
 def get_linked_edges(
     obj: bpy.types.Object,
     verts: Union[list[bpy.types.MeshVertex], list[bmesh.types.BMVert]],
+    session: Optional[EditMeshSession] = None,
 ) -> Union[list[bpy.types.MeshEdge], list[bmesh.types.BMEdge]]:
-    bm = bmesh.from_edit_mesh(obj.data)
-    edges = list({edge for vert in verts for edge in bm.verts[vert.index].link_edges})
-    bm.free()
+    with edit_mesh_session(obj, session) as session:
+        session.ensure_lookup_tables()
+        edges = list(
+            {edge for vert in verts for edge in session.bm.verts[vert.index].link_edges}
+        )
     if isinstance(verts[0], bmesh.types.BMVert):
         return edges
     return [obj.data.edges[e.index] for e in edges]
@@ -313,36 +496,34 @@ def get_linked_edges(
 def select_open_border_loop(
     obj: bpy.types.Object,
     selected_edges: Union[list[bpy.types.MeshEdge], list[bmesh.types.BMEdge]],
+    session: Optional[EditMeshSession] = None,
 ):
-    bm = bmesh.from_edit_mesh(obj.data)
-    selected_bm_edges = [
-        bm.edges[e.index]
-        for e in selected_edges
-        if len(bm.edges[e.index].link_faces) == 1
-    ]
-    neighbours_to_check = [
-        linked_edge
-        for selected_edge in selected_bm_edges
-        for v in selected_edge.verts
-        for linked_edge in v.link_edges
-        if linked_edge not in selected_bm_edges and len(linked_edge.link_faces) == 1
-    ]
-    while len(neighbours_to_check) > 0:
-        edge = neighbours_to_check[-1]
-        neighbours_to_check.remove(edge)
-        selected_bm_edges.append(edge)
-        neighbours_to_check.extend(
-            [
+    with edit_mesh_session(obj, session) as session:
+        session.ensure_lookup_tables()
+        bm = session.bm
+        selected_bm_edges = {
+            bm.edges[e.index]
+            for e in selected_edges
+            if len(bm.edges[e.index].link_faces) == 1
+        }
+        neighbours_to_check = {
+            linked_edge
+            for selected_edge in selected_bm_edges
+            for v in selected_edge.verts
+            for linked_edge in v.link_edges
+            if linked_edge not in selected_bm_edges and len(linked_edge.link_faces) == 1
+        }
+        while len(neighbours_to_check) > 0:
+            edge = neighbours_to_check.pop()
+            selected_bm_edges.add(edge)
+            neighbours_to_check.update(
                 linked_edge
                 for v in edge.verts
                 for linked_edge in v.link_edges
                 if linked_edge not in selected_bm_edges
                 and len(linked_edge.link_faces) == 1
-                and linked_edge not in neighbours_to_check
-            ]
-        )
-    bm.free()
-    select_by_id(obj, "EDGE", [e.index for e in selected_bm_edges])
+            )
+        select_by_id(obj, "EDGE", [e.index for e in selected_bm_edges], session=session)
 
 
 def select_objects(
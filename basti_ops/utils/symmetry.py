@@ -0,0 +1,181 @@
+from typing import Literal, Optional
+
+import bpy
+import bmesh
+import numpy as np
+from mathutils import Matrix, Vector
+from mathutils.kdtree import KDTree
+
+from .cache import LRUCache, get_array_hash
+from .edit_mesh import EditMeshSession
+from .mesh import get_mesh_vertex_vectors
+from .topology import get_edge_vertex_array
+from .transform import get_plane_functional, get_reflection_matrix
+
+# enum items of the mirror operators, matching the arguments of get_mirror_plane
+MIRROR_AXIS_ITEMS = [
+    ("X", "X", "X"),
+    ("Y", "Y", "Y"),
+    ("Z", "Z", "Z"),
+]
+MIRROR_ORIENTATION_ITEMS = [
+    ("GLOBAL", "Global", "World axes, or object axes with the object pivot"),
+    ("CURSOR", "Cursor", "3d Cursor axes"),
+    ("VIEW", "View", "View axes"),
+    ("ACTIVE_FACE", "Active Face", "Plane of the active face"),
+]
+MIRROR_PIVOT_ITEMS = [
+    ("ORIGIN", "Origin", "World Origin"),
+    ("PIVOT", "Pivot", "Object Pivot"),
+    ("CURSOR", "Cursor", "3d Cursor"),
+]
+
+# mirror partner maps of recently used meshes, each holds one index per vertex
+SYMMETRY_MAP_CACHE = LRUCache(32, max_bytes=64 * 1024 * 1024)
+
+
+def get_mirror_plane(
+    context: bpy.types.Context,
+    obj: bpy.types.Object,
+    bm: bmesh.types.BMesh,
+    axis: Literal["X", "Y", "Z"],
+    orientation: Literal["GLOBAL", "CURSOR", "VIEW", "ACTIVE_FACE"] = "GLOBAL",
+    pivot: Literal["ORIGIN", "PIVOT", "CURSOR"] = "ORIGIN",
+) -> Optional[tuple[Vector, Vector, bool]]:
+    """Returns the point and normal of the mirror plane and whether they are in world space.
+    With the global orientation and the object pivot the plane is on the object axes"""
+    if orientation == "ACTIVE_FACE":
+        face = bm.faces.active
+        if not face:
+            return None
+        normal = obj.matrix_world.to_3x3().inverted().transposed() @ face.normal
+        return obj.matrix_world @ face.calc_center_median(), normal, True
+
+    normal = Vector(
+        (
+            1.0 if axis == "X" else 0.0,
+            1.0 if axis == "Y" else 0.0,
+            1.0 if axis == "Z" else 0.0,
+        )
+    )
+    if orientation == "CURSOR":
+        normal = context.scene.cursor.matrix.to_3x3() @ normal
+    elif orientation == "VIEW":
+        if not context.region_data:
+            return None
+        normal = context.region_data.view_rotation @ normal
+
+    if pivot == "PIVOT":
+        if orientation == "GLOBAL":
+            return Vector(), normal, False
+        return obj.matrix_world.translation.copy(), normal, True
+    if pivot == "CURSOR":
+        return context.scene.cursor.location.copy(), normal, True
+    return Vector(), normal, True
+
+
+def get_local_plane_distances(
+    coords: np.ndarray,
+    plane_point: Vector,
+    plane_normal: Vector,
+    matrix: Optional[Matrix] = None,
+) -> np.ndarray:
+    """Returns the signed distances of the local coords to the plane, measured in local space.
+    With a matrix the plane is in the space the matrix maps to, e.g. world space with the matrix_world
+    """
+    if matrix is not None:
+        plane_point = matrix.inverted() @ plane_point
+        plane_normal = matrix.to_3x3().transposed() @ plane_normal
+    factors, offset = get_plane_functional(plane_point, plane_normal)
+    return coords @ factors + offset
+
+
+def build_symmetry_map(
+    coords: np.ndarray,
+    reflection: np.ndarray,
+    distance: float,
+    query_ids: Optional[np.ndarray] = None,
+    candidate_ids: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Returns the index of the closest candidate vertex to the mirrored position of every queried vertex,
+    or -1 if there is none within the distance or the vertex wasn't queried. All vertices by default
+    """
+    if query_ids is None:
+        query_ids = np.arange(len(coords))
+    if candidate_ids is None:
+        candidate_ids = np.arange(len(coords))
+
+    partners = np.full(len(coords), -1, dtype=np.int32)
+    if len(query_ids) == 0 or len(candidate_ids) == 0:
+        return partners
+
+    kd = KDTree(len(candidate_ids))
+    for i, co in zip(candidate_ids.tolist(), coords[candidate_ids].tolist()):
+        kd.insert(co, i)
+    kd.balance()
+
+    mirrored = coords[query_ids] @ reflection[:3, :3].T + reflection[:3, 3]
+    for i, co in zip(query_ids.tolist(), mirrored.tolist()):
+        _, index, found_distance = kd.find(co)
+        if index is not None and found_distance <= distance:
+            partners[i] = index
+    return partners
+
+
+def get_symmetry_map(
+    obj: bpy.types.Object,
+    plane_point: Vector,
+    plane_normal: Vector,
+    world_space: bool,
+    distance: float,
+    session: Optional[EditMeshSession] = None,
+    vert_ids: Optional[np.ndarray] = None,
+    cached_only: bool = False,
+) -> Optional[np.ndarray]:
+    """Returns the mirror partner index of every vertex, -1 for vertices without one.
+    When all of the vert ids are on one side of the plane, only that side gets partners
+    and only the other side is searched for them.
+    The map is built once per mesh, vertex positions and plane and reused until they change.
+    With cached only, None is returned instead of building a map that isn't cached yet
+    """
+    if session is not None:
+        session.sync()
+    elif obj.mode == "EDIT":
+        obj.update_from_editmode()
+
+    mesh = obj.data
+    matrix = obj.matrix_world if world_space else None
+    reflection = np.array(get_reflection_matrix(plane_point, plane_normal, matrix))
+    coords = get_mesh_vertex_vectors(mesh)
+    distances = get_local_plane_distances(coords, plane_point, plane_normal, matrix)
+
+    # the side the partners are needed for, vertices within the distance of the plane count for both
+    side = 0
+    if vert_ids is not None and len(vert_ids) > 0:
+        if (distances[vert_ids] >= -distance).all():
+            side = 1
+        elif (distances[vert_ids] <= distance).all():
+            side = -1
+
+    key = (
+        mesh.name_full,
+        get_array_hash(get_edge_vertex_array(mesh), coords),
+        get_array_hash(np.round(reflection, 6)),
+        distance,
+        side,
+    )
+
+    def compute() -> np.ndarray:
+        query_ids = candidate_ids = None
+        if side != 0:
+            query_ids = np.flatnonzero(distances * side >= -distance)
+            candidate_ids = np.flatnonzero(distances * side <= distance)
+        partners = build_symmetry_map(
+            coords, reflection, distance, query_ids, candidate_ids
+        )
+        partners.flags.writeable = False
+        return partners
+
+    if cached_only:
+        return SYMMETRY_MAP_CACHE.get(key)
+    return SYMMETRY_MAP_CACHE.get_or_compute(key, compute)
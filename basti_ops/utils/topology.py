@@ -0,0 +1,81 @@
+import bpy
+import numpy as np
+
+
+def get_edge_vertex_array(mesh: bpy.types.Mesh) -> np.ndarray:
+    """Returns the vertex indices of all edges as an (n, 2) array"""
+    edge_verts = np.zeros(len(mesh.edges) * 2, dtype=np.int32)
+    mesh.edges.foreach_get("vertices", edge_verts)
+    return edge_verts.reshape(-1, 2)
+
+
+def get_csr_rows(
+    offsets: np.ndarray, values: np.ndarray, row_ids: np.ndarray
+) -> np.ndarray:
+    """Returns the values of all given rows of a compressed sparse row layout concatenated into one array"""
+    starts = offsets[row_ids]
+    counts = offsets[row_ids + 1] - starts
+    total = int(counts.sum())
+    if total == 0:
+        return np.zeros(0, dtype=values.dtype)
+
+    run_offsets = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+    return values[run_offsets + np.arange(total)]
+
+
+def get_polygon_vertex_array(mesh: bpy.types.Mesh) -> tuple[np.ndarray, np.ndarray]:
+    """Returns the polygon corners as offsets and vertex indices.
+    The vertices of polygon i are vert_ids[offsets[i]:offsets[i + 1]]"""
+    offsets = np.zeros(len(mesh.polygons) + 1, dtype=np.int64)
+    loop_starts = np.zeros(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("loop_start", loop_starts)
+    offsets[:-1] = loop_starts
+    offsets[-1] = len(mesh.loops)
+
+    vert_ids = np.zeros(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", vert_ids)
+    return offsets, vert_ids
+
+
+def find_roots(parents: np.ndarray) -> np.ndarray:
+    """Compresses the union-find forest until every vertex points at its root"""
+    while True:
+        grandparents = parents[parents]
+        if np.array_equal(grandparents, parents):
+            return parents
+        parents = grandparents
+
+
+def label_islands(edge_verts: np.ndarray, vert_count: int) -> np.ndarray:
+    """Returns an island id per vertex, labeling all connected components in one sweep.
+    Island ids are numbered from zero in the order of their lowest vertex index"""
+    parents = np.arange(vert_count)
+    verts_a = edge_verts[:, 0]
+    verts_b = edge_verts[:, 1]
+
+    while len(verts_a) > 0:
+        roots_a = parents[verts_a]
+        roots_b = parents[verts_b]
+        unmerged = roots_a != roots_b
+        if not unmerged.any():
+            break
+        verts_a = verts_a[unmerged]
+        verts_b = verts_b[unmerged]
+        roots_a = roots_a[unmerged]
+        roots_b = roots_b[unmerged]
+
+        # hook the higher root under the lower one, so the forest never forms cycles
+        np.minimum.at(
+            parents, np.maximum(roots_a, roots_b), np.minimum(roots_a, roots_b)
+        )
+        parents = find_roots(parents)
+
+    _, labels = np.unique(parents, return_inverse=True)
+    return labels
+
+
+def get_island_mask(labels: np.ndarray, seed_ids: np.ndarray) -> np.ndarray:
+    """Returns a boolean mask of all vertices on islands touching the seeds"""
+    islands_touched = np.zeros(labels.max(initial=-1) + 1, dtype=bool)
+    islands_touched[labels[np.asarray(seed_ids, dtype=np.int64)]] = True
+    return islands_touched[labels]
@@ -0,0 +1,138 @@
+from typing import Optional, Sequence
+
+import numpy as np
+from mathutils import Matrix, Vector
+
+
+def get_euler_matrices(angles: np.ndarray) -> np.ndarray:
+    """Returns (n, 3, 3) rotation matrices for (n, 3) XYZ euler angles in radians"""
+    cos_x, cos_y, cos_z = np.cos(angles).T
+    sin_x, sin_y, sin_z = np.sin(angles).T
+
+    # Rz @ Ry @ Rx, the order Blender applies XYZ euler rotations in
+    matrices = np.empty((len(angles), 3, 3))
+    matrices[:, 0, 0] = cos_y * cos_z
+    matrices[:, 0, 1] = sin_x * sin_y * cos_z - cos_x * sin_z
+    matrices[:, 0, 2] = cos_x * sin_y * cos_z + sin_x * sin_z
+    matrices[:, 1, 0] = cos_y * sin_z
+    matrices[:, 1, 1] = sin_x * sin_y * sin_z + cos_x * cos_z
+    matrices[:, 1, 2] = cos_x * sin_y * sin_z - sin_x * cos_z
+    matrices[:, 2, 0] = -sin_y
+    matrices[:, 2, 1] = sin_x * cos_y
+    matrices[:, 2, 2] = cos_x * cos_y
+    return matrices
+
+
+def compose_matrices(
+    rotations: Optional[np.ndarray] = None,
+    translations: Optional[np.ndarray] = None,
+    count: Optional[int] = None,
+) -> np.ndarray:
+    """Returns (n, 4, 4) matrices rotating by the (n, 3, 3) rotations and then moving by the (n, 3) translations"""
+    if count is None:
+        count = len(rotations) if rotations is not None else len(translations)
+    matrices = np.broadcast_to(np.eye(4), (count, 4, 4)).copy()
+    if rotations is not None:
+        matrices[:, :3, :3] = rotations
+    if translations is not None:
+        matrices[:, :3, 3] = translations
+    return matrices
+
+
+def get_pivot_matrices(matrices: np.ndarray, pivot: Sequence[float]) -> np.ndarray:
+    """Returns the matrices applied around the pivot instead of the origin"""
+    pivot = np.asarray(pivot, dtype=np.float64)
+    pivot_matrices = matrices.copy()
+    pivot_matrices[:, :3, 3] += pivot - matrices[:, :3, :3] @ pivot
+    return pivot_matrices
+
+
+def get_random_transforms(
+    count: int,
+    seed: int,
+    offset_range: tuple[Sequence[float], Sequence[float]],
+    rotation_range: tuple[Sequence[float], Sequence[float]],
+) -> tuple[np.ndarray, np.ndarray]:
+    """Returns (count, 3) offsets and (count, 3) euler angles drawn uniformly from the ranges.
+    All values come from one draw, so the first copies stay the same when the count grows
+    """
+    low = np.concatenate(
+        (np.asarray(offset_range[0]), np.asarray(rotation_range[0]))
+    ).astype(np.float64)
+    high = np.concatenate(
+        (np.asarray(offset_range[1]), np.asarray(rotation_range[1]))
+    ).astype(np.float64)
+    values = low + np.random.default_rng(seed % 2**32).random((max(count, 0), 6)) * (
+        high - low
+    )
+    return values[:, :3], values[:, 3:]
+
+
+def to_matrices(matrices: np.ndarray) -> list[Matrix]:
+    """Returns the (n, 4, 4) array as a list of mathutils matrices"""
+    return [Matrix(m.tolist()) for m in matrices]
+
+
+def to_vectors(vectors: np.ndarray) -> list[Vector]:
+    """Returns the (n, 3) array as a list of mathutils vectors"""
+    return [Vector(v) for v in vectors.tolist()]
+
+
+def get_reflection_matrix(
+    point: Vector, normal: Vector, matrix: Optional[Matrix] = None
+) -> Matrix:
+    """Returns the matrix mirroring across the plane through the point with the normal.
+    With a matrix the plane is in the space the matrix maps to and the result works on coordinates before it,
+    e.g. a world space plane and local coordinates with the matrix_world"""
+    reflection = (
+        Matrix.Translation(point)
+        @ Matrix.Scale(-1.0, 4, normal.normalized())
+        @ Matrix.Translation(-point)
+    )
+    if matrix is None:
+        return reflection
+    return matrix.inverted() @ reflection @ matrix
+
+
+def get_plane_functional(
+    point: Vector, normal: Vector, matrix: Optional[Matrix] = None
+) -> tuple[np.ndarray, float]:
+    """Returns the factors and offset so that coords @ factors + offset are the signed distances to the plane.
+    The coords are transformed by the matrix first, if one is given"""
+    normal = np.array(normal.normalized())
+    point = np.array(point)
+    if matrix is None:
+        return normal, float(-normal @ point)
+    matrix = np.array(matrix)
+    return matrix[:3, :3].T @ normal, float(normal @ (matrix[:3, 3] - point))
+
+
+def get_alignment_matrices(
+    directions: np.ndarray, axis: Sequence[float] = (0.0, 0.0, 1.0)
+) -> np.ndarray:
+    """Returns (n, 3, 3) rotation matrices turning the axis onto each of the (n, 3) directions along the shortest arc"""
+    axis = np.asarray(axis, dtype=np.float64)
+    axis = axis / np.linalg.norm(axis)
+    directions = directions / np.linalg.norm(directions, axis=1, keepdims=True)
+
+    crossed = np.cross(axis, directions)
+    cosines = directions @ axis
+    skew = np.zeros((len(directions), 3, 3))
+    skew[:, 0, 1] = -crossed[:, 2]
+    skew[:, 0, 2] = crossed[:, 1]
+    skew[:, 1, 0] = crossed[:, 2]
+    skew[:, 1, 2] = -crossed[:, 0]
+    skew[:, 2, 0] = -crossed[:, 1]
+    skew[:, 2, 1] = crossed[:, 0]
+
+    # Rodrigues' formula, which breaks down for directions opposite of the axis
+    opposite = cosines < -0.999999
+    factors = 1.0 / np.where(opposite, 1.0, 1.0 + cosines)
+    matrices = np.eye(3) + skew + skew @ skew * factors[:, np.newaxis, np.newaxis]
+
+    # turn those half way around any axis perpendicular to the axis instead
+    helper = np.eye(3)[np.argmin(np.abs(axis))]
+    perpendicular = np.cross(axis, helper)
+    perpendicular /= np.linalg.norm(perpendicular)
+    matrices[opposite] = 2.0 * np.outer(perpendicular, perpendicular) - np.eye(3)
+    return matrices